@@ -1,61 +1,103 @@
 #ENSURES DATA CHECKS BEFORE SCHEMA EXECUTION...
 # app/bootstrap.py
-from sqlalchemy import text
+from sqlalchemy import text, inspect
 from db_config import engine
 
 from schemas import TB_DDL
-from schemas import TB_STG
 
 from schemas import PNL_DDL
-from schemas import PNL_STG
 
 from schemas import JOURNALS_DDL
-from schemas import JOURNALS_STG
 
 from schemas import MANUALJOURNALS_DDL
-from schemas import MANUALJOURNALS_STG
+from schemas import MANUALJOURNAL_LINES_DDL
 
 
 from schemas import ACCOUNTS_DDL
-from schemas import ACCOUNTS_STG
+
+from schemas import BANKTRANSACTIONS_DDL
 
 
 from schemas import MASTER_DDL
 
+from schemas import SYNC_STATE_DDL
+
+from schemas import REPORT_STORE_DDL
+
+from schemas import JOURNAL_PROCESS
+
+from schemas import SECONDARY_INDEXES
+
+from schemas import ddl_for
+
+from schemas import MONEY_COLUMNS
+
+from schemas import DERIVED_COLUMNS, DERIVED_SQL, RETIRED_INDEXES
+
+
+def ensure_column(conn, table: str, column: str, decl: str) -> bool:
+    # CREATE TABLE IF NOT EXISTS does not touch existing tables, so new columns are added here
+    cols = {c["name"] for c in inspect(conn).get_columns(table)}
+    if column not in cols:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {decl}"))
+        return True
+    return False
+
+
+def ensure_cents_columns(conn):
+    # older databases: add <col>_cents and fill it once from the stored amount, in one UPDATE per column
+    for table, cols in MONEY_COLUMNS.items():
+        for col in cols:
+            if ensure_column(conn, table, f"{col}_cents", "BIGINT NULL"):
+                conn.execute(text(f"""UPDATE {table} SET {col}_cents = CAST(ROUND({col} * 100) AS BIGINT)
+                                      WHERE {col} IS NOT NULL"""))
+
+
+DERIVED_DECL = {"int": "BIGINT NULL", "year": "INTEGER NULL", "month": "INTEGER NULL"}
+
+
+def ensure_derived_columns(conn):
+    # older databases: add the typed accountcode / referencenumber / period columns and fill them
+    # once from the text columns (same rules as transform.add_derived_columns)
+    for table, derived in DERIVED_COLUMNS.items():
+        for col, (kind, src) in derived.items():
+            if ensure_column(conn, table, col, DERIVED_DECL[kind]):
+                expr = DERIVED_SQL[(kind, conn.dialect.name)].format(src=src)
+                conn.execute(text(f"UPDATE {table} SET {col} = {expr} WHERE {src} IS NOT NULL"))
+
 
 def ensure_schema():
     # engine.begin() gives you a transactional connection that auto-commits/rolls back
+    # *_stg tables are no longer used (loaders upsert directly); the drops below clean up old databases
     with engine.begin() as conn:
         
 
         #conn.execute(text("""DROP TABLE IF EXISTS master"""))
-        conn.execute(text(MASTER_DDL))
+        conn.execute(text(ddl_for(MASTER_DDL, conn.dialect.name)))
         #----------------------------------------------------------------------------
         #conn.execute(text("""DROP TABLE IF EXISTS tb_client"""))
-        conn.execute(text(TB_DDL))
+        conn.execute(text(ddl_for(TB_DDL, conn.dialect.name)))
         
 
         conn.execute(text("""DROP TABLE IF EXISTS tb_client_stg"""))
-        conn.execute(text(TB_STG))
         #-----------------------------------------------------------------------------
 
         #conn.execute(text("""DROP TABLE IF EXISTS pnl_client"""))
-        conn.execute(text(PNL_DDL))
+        conn.execute(text(ddl_for(PNL_DDL, conn.dialect.name)))
         
 
         conn.execute(text("""DROP TABLE IF EXISTS pnl_client_stg"""))
-        conn.execute(text(PNL_STG))
 
 
         #-----------------------------------------------------------------------------
 
 
         #conn.execute(text("""DROP TABLE IF EXISTS journalsraw"""))
-        conn.execute(text(JOURNALS_DDL))
+        conn.execute(text(ddl_for(JOURNALS_DDL, conn.dialect.name)))
+        ensure_column(conn, "journalsraw", "row_fingerprint", "TEXT NULL")
         
 
         conn.execute(text("""DROP TABLE IF EXISTS journalsrawstg"""))
-        conn.execute(text(JOURNALS_STG))
 
 
 
@@ -63,19 +105,45 @@ def ensure_schema():
         #-----------------------------------------------------------------------------
 
         #conn.execute(text("""DROP TABLE IF EXISTS manualjournalsraw"""))
-        conn.execute(text(MANUALJOURNALS_DDL))
+        conn.execute(text(ddl_for(MANUALJOURNALS_DDL, conn.dialect.name)))
+        conn.execute(text(ddl_for(MANUALJOURNAL_LINES_DDL, conn.dialect.name)))
         
 
         conn.execute(text("""DROP TABLE IF EXISTS manualjournalsstg"""))
-        conn.execute(text(MANUALJOURNALS_STG))
         #------------------------------------------------------------------------------
 
 
 
         #conn.execute(text("""DROP TABLE IF EXISTS accountsraw"""))
-        conn.execute(text(ACCOUNTS_DDL))
+        conn.execute(text(ddl_for(ACCOUNTS_DDL, conn.dialect.name)))
         
 
         conn.execute(text("""DROP TABLE IF EXISTS accountsstg"""))
-        conn.execute(text(ACCOUNTS_STG))
+        #------------------------------------------------------------------------------
+
+        conn.execute(text(ddl_for(BANKTRANSACTIONS_DDL, conn.dialect.name)))
+        #------------------------------------------------------------------------------
+
+        conn.execute(text(ddl_for(SYNC_STATE_DDL, conn.dialect.name)))
+        #------------------------------------------------------------------------------
+
+        conn.execute(text(ddl_for(REPORT_STORE_DDL, conn.dialect.name)))
+        #------------------------------------------------------------------------------
+
+        conn.execute(text(ddl_for(JOURNAL_PROCESS, conn.dialect.name)))
+        #------------------------------------------------------------------------------
+
+        ensure_cents_columns(conn)
+        #------------------------------------------------------------------------------
+
+        ensure_derived_columns(conn)
+        #------------------------------------------------------------------------------
+
+        for name in RETIRED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        #------------------------------------------------------------------------------
+
+        # every table exists by now; indexes last
+        for ddl in SECONDARY_INDEXES:
+            conn.execute(text(ddl))
         #------------------------------------------------------------------------------
\ No newline at end of file
@@ -2,27 +2,45 @@ import gspread
 from gspread_dataframe import set_with_dataframe
 from google.oauth2.service_account import Credentials
 import pandas as pd
-
-# Authenticate using service account
-creds = Credentials.from_service_account_file(
-    "credentials_gsheet.json",
-    scopes=[
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive"
-    ]
-)
-
-client = gspread.authorize(creds)
-
-# Open spreadsheet by URL
-sheet = client.open_by_url(
-    "https://docs.google.com/spreadsheets/d/1mFLRmeCVrJPEfnwFQJcE3bXGb7FOg989wy2_-ZvnX6A/edit?gid=833080280#gid=833080280"
-)
+import re
+import xerocache
+
+_sheet = None
+
+def get_sheet():
+    # Connects on first use, so importing this module (or a --replay run) needs no network
+    global _sheet
+    if _sheet is None:
+        # Authenticate using service account
+        creds = Credentials.from_service_account_file(
+            "credentials_gsheet.json",
+            scopes=[
+                "https://www.googleapis.com/auth/spreadsheets",
+                "https://www.googleapis.com/auth/drive"
+            ]
+        )
+
+        client = gspread.authorize(creds)
+
+        # Open spreadsheet by URL
+        _sheet = client.open_by_url(
+            "https://docs.google.com/spreadsheets/d/1mFLRmeCVrJPEfnwFQJcE3bXGb7FOg989wy2_-ZvnX6A/edit?gid=833080280#gid=833080280"
+        )
+    return _sheet
 
 # Select tab
 #worksheet = sheet.worksheet("Sheet1")
 
-def sheetdump(df: pd.DataFrame,datatype: str):
+def sheetdump(df: pd.DataFrame,datatype: str,tab_suffix: str = ""):
+    # tab_suffix keeps per-tenant runs (sync --all-tenants) on their own tabs, e.g. " - Acme Ltd"
+    if xerocache.is_replay():
+        # offline run: leave the frame on disk instead of pushing to Google
+        path = datatype + re.sub(r"\W+", "_", tab_suffix) + "_replay.csv"
+        df.to_csv(path, index=False)
+        print(f"replay: wrote {len(df)} rows to {path} instead of the sheet")
+        return
+
+    sheet = get_sheet()
     if datatype=="pnl":
         try:
             ws = sheet.worksheet("PnL comp chart")
@@ -68,11 +86,35 @@ def sheetdump(df: pd.DataFrame,datatype: str):
         except Exception:
             pass
 
+    elif datatype=="tb_wide":
+        try:
+            ws = sheet.worksheet("Trial Balance by date")
+        except gspread.exceptions.WorksheetNotFound:
+            ws = sheet.add_worksheet(title="Trial Balance by date", rows="1000", cols="100")
+
+        # Clear old content
+        ws.clear()
+
+        # (Optional) resize to DataFrame size for nicer sheet bounds
+        nrows = max(len(df) + 1, 100)  # +1 for header
+        ncols = max(len(df.columns), 26)
+        ws.resize(rows=nrows, cols=ncols)
+
+        # Write DataFrame (header in A1)
+        set_with_dataframe(ws, df, include_index=False, include_column_header=True)
+
+        # (Optional) freeze header row + the account columns
+        try:
+            ws.freeze(rows=1, cols=4)
+        except Exception:
+            pass
+
     elif datatype=="accounttrans":
+        title = f"Account_transactions_test{tab_suffix}"
         try:
-            ws = sheet.worksheet("Account_transactions_test")
+            ws = sheet.worksheet(title)
         except gspread.exceptions.WorksheetNotFound:
-            ws = sheet.add_worksheet(title="Account_transactions_test", rows="10000", cols="100")
+            ws = sheet.add_worksheet(title=title, rows="10000", cols="100")
 
         # Clear old content
         ws.clear()
@@ -0,0 +1,117 @@
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+
+# Row hashing helpers shared by the transforms.
+#
+# ROW_HASH_MODE picks how row_hash keys (tb_client / pnl_client primary keys) are built:
+#   sha256 (default) - same 64-char SHA-256 keys as before, so existing rows still match
+#   fast             - 16-char keys from pd.util.hash_pandas_object, fully vectorised.
+#                      Keys differ from sha256 ones: only switch on a fresh database.
+
+ROW_HASH_MODE = os.environ.get("ROW_HASH_MODE", "sha256").lower()
+
+
+def _legacy_parts(df: pd.DataFrame, cols: list[str]) -> list[list[str]]:
+    # astype(str).str.strip() per column, as plain lists; nulls read "nan"
+    # (what older pandas produced from astype(str)) instead of propagating
+    return [df[c].astype(str).fillna("nan").str.strip().tolist() for c in cols]
+
+
+def normalized_key(df: pd.DataFrame, cols: list[str], lower: bool = True) -> pd.Series:
+    """
+    Joins the given columns into one '|' separated string per row.
+    Missing columns and nulls become "" so the key does not depend on which optional
+    columns (e.g. tracking categories) happened to be present in a page.
+    """
+    parts = []
+    for c in cols:
+        if c in df.columns:
+            s = df[c].astype(object).where(df[c].notnull(), "").astype(str).str.strip()
+        else:
+            s = pd.Series("", index=df.index)
+        parts.append(s.str.lower() if lower else s)
+
+    return parts[0].str.cat(parts[1:], sep="|")
+
+
+def sha256_hex(keys: pd.Series) -> pd.Series:
+    # One pass over a plain list: no per-row Series.apply overhead
+    sha = hashlib.sha256
+    return pd.Series([sha(k.encode("utf-8")).hexdigest() for k in keys.tolist()], index=keys.index)
+
+
+def legacy_sha256(df: pd.DataFrame, cols: list[str]) -> pd.Series:
+    # join + lower + digest in a single loop, byte-for-byte the old row_hash
+    sha = hashlib.sha256
+    digests = [sha("|".join(p).lower().encode("utf-8")).hexdigest() for p in zip(*_legacy_parts(df, cols))]
+    return pd.Series(digests, index=df.index, dtype=object)
+
+
+def fast_hash(df: pd.DataFrame, cols: list[str]) -> pd.Series:
+    # Numbers are hashed as numbers; text is stripped/lower-cased column-wise, then
+    # hash_pandas_object combines all columns in C with no per-row Python work.
+    norm = {}
+    for c in cols:
+        s = df[c]
+        if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+            norm[c] = s
+        else:
+            norm[c] = s.astype(str).fillna("nan").str.strip().str.lower()
+    hashed = pd.util.hash_pandas_object(pd.DataFrame(norm, index=df.index), index=False).to_numpy(dtype=np.uint64)
+    # uint64 -> 16 hex chars for the whole column at once
+    hexed = np.frombuffer(hashed.astype(">u8").tobytes().hex().encode("ascii"), dtype="S16")
+    return pd.Series(hexed.astype(str), index=df.index, dtype=object)
+
+
+def row_hash(df: pd.DataFrame, cols: list[str], mode: str | None = None) -> pd.Series:
+    mode = (mode or ROW_HASH_MODE).lower()
+    if mode == "fast":
+        return fast_hash(df, cols)
+    return legacy_sha256(df, cols)
+
+
+def sha256_rows(df: pd.DataFrame, cols: list[str], lower: bool = True) -> pd.Series:
+    return sha256_hex(normalized_key(df, cols, lower=lower))
+
+
+if __name__ == "__main__":
+    # Micro-benchmark: python hashing.py [rows]
+    import sys
+    import time
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "tenant_id": "d7418ac2-e3ec-488b-b942-5bfef34ff7b7",
+        "date": pd.Series(rng.integers(0, 365, n)).map(lambda d: f"2025-{1 + d % 12:02d}-{1 + d % 28:02d}"),
+        "section": rng.choice(["Income", "Less Cost of Sales", "Less Operating Expenses"], n),
+        "label": pd.Series(rng.integers(0, 500, n)).map(lambda i: f"Account {i}"),
+        "amount": rng.normal(0, 1000, n).round(2),
+        "accountid": pd.Series(rng.integers(0, 500, n)).map(lambda i: f"acc-{i:08d}"),
+    })
+    cols = list(df.columns)
+
+    def old_way(d):
+        key = (d["tenant_id"].astype(str).str.strip().str.lower() + "|" +
+               d["date"].astype(str).str.strip().str.lower() + "|" +
+               d["section"].astype(str).str.strip().str.lower() + "|" +
+               d["label"].astype(str).str.strip().str.lower() + "|" +
+               d["amount"].astype(str).str.strip().str.lower() + "|" +
+               d["accountid"].astype(str).str.strip().str.lower())
+        return key.apply(lambda s: hashlib.sha256(s.encode("utf-8")).hexdigest())
+
+    timings = {}
+    for name, fn in [("apply (old)", old_way),
+                     ("sha256 (compat)", lambda d: row_hash(d, cols, "sha256")),
+                     ("fast", lambda d: row_hash(d, cols, "fast"))]:
+        t0 = time.perf_counter()
+        out = fn(df)
+        timings[name] = time.perf_counter() - t0
+        print(f"{name:16s} {timings[name]:7.2f}s  {n / timings[name]:12,.0f} rows/s")
+        if name == "apply (old)":
+            reference = out
+
+    assert row_hash(df, cols, "sha256").tolist() == reference.tolist(), "compat keys differ"
+    print("sha256 compat keys match the old row_hash")
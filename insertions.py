@@ -3,13 +3,20 @@ from sqlalchemy import select,func,text,bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from db_config import SessionLocal
 import pandas as pd
-from transform import trigger_TB
+from transform import trigger_TB, trigger_TB_many
 from transform import trigger_pnl
-from transform import trigger_journals
-from transform import trigger_manualjournals
+from transform import iter_journals
+from transform import iter_manualjournals
 from transform import master_data
 from transform import trigger_account
+from transform import iter_banktrans
+from xerotokens import get_tenant_id
 import argparse
+import io
+import os
+import xerocache
+from dataclasses import dataclass
+from datetime import datetime, timezone
 
 
 #--------------------------------------------------------------------------------------------------------
@@ -52,247 +59,337 @@ def master_load():
 
 #--------------------------------------------
 
+#SYNC STATE (high-water marks / last sync per tenant and endpoint)
+
+def utc_now() -> str:
+    # Same shape Xero expects in If-Modified-Since (UTC, no offset)
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def get_sync_state(endpoint: str) -> dict:
+    with engine.connect() as conn:
+        row = conn.execute(
+            text("SELECT high_water, last_sync_utc FROM sync_state WHERE tenant_id = :tenant_id AND endpoint = :endpoint"),
+            {"tenant_id": get_tenant_id(), "endpoint": endpoint},
+        ).mappings().first()
+    return dict(row) if row else {"high_water": None, "last_sync_utc": None}
+
+
+def set_sync_state(session, endpoint: str, high_water: int | None = None, last_sync_utc: str | None = None):
+    if xerocache.is_replay():
+        # replayed payloads are old; moving the marks would make the next live run skip changes
+        return
+    session.execute(text("""
+        INSERT INTO sync_state (tenant_id, endpoint, high_water, last_sync_utc)
+        VALUES (:tenant_id, :endpoint, :high_water, :last_sync_utc)
+        ON CONFLICT (tenant_id, endpoint) DO UPDATE SET
+            high_water    = COALESCE(excluded.high_water, sync_state.high_water),
+            last_sync_utc = COALESCE(excluded.last_sync_utc, sync_state.last_sync_utc)
+    """), {
+        "tenant_id": get_tenant_id(),
+        "endpoint": endpoint,
+        "high_water": high_water,
+        "last_sync_utc": last_sync_utc or utc_now(),
+    })
+
+#--------------------------------------------
+
+#SHARED UPSERT (one pass per batch instead of staging insert + insert-missing + update-all)
+
+@dataclass
+class UpsertResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __add__(self, other: "UpsertResult") -> "UpsertResult":
+        return UpsertResult(
+            self.inserted + other.inserted,
+            self.updated + other.updated,
+            self.unchanged + other.unchanged,
+        )
+
+    def __str__(self) -> str:
+        return f"inserted={self.inserted} updated={self.updated} unchanged={self.unchanged}"
+
+
+def build_upsert(table: str, cols: list[str], key: str, fingerprint: str | None = None):
+    """
+    INSERT ... ON CONFLICT(key) DO UPDATE, touching a row only when some column differs,
+    so unchanged rows cost no write (and no WAL growth).
+    With a fingerprint column only that one column is compared.
+    """
+    non_key = [c for c in cols if c != key]
+    col_list = ", ".join(cols)
+    values = ", ".join(f":{c}" for c in cols)
+    assignments = ",\n        ".join(f"{c} = excluded.{c}" for c in non_key)
+    compare = [fingerprint] if fingerprint else non_key
+    changed = "\n        OR ".join(f"{table}.{c} IS NOT excluded.{c}" for c in compare)
+    return text(f"""
+    INSERT INTO {table} ({col_list})
+    VALUES ({values})
+    ON CONFLICT ({key}) DO UPDATE SET
+        {assignments}
+    WHERE {changed}
+    """)
+
+
+def frame_rows(df: pd.DataFrame, cols: list[str]) -> list[dict]:
+    for c in cols:
+        if c not in df.columns:
+            df[c] = None  # create the column so keys exist in dicts
+
+    # For fullproof checks
+    df = df.astype(object).where(df.notnull(), None)
+
+    return df[cols].to_dict(orient="records")  # preserve consistent key set & order
+
+
+EXISTING_VALUES_SQL = "SELECT {col} FROM {table} WHERE {col} IN :vals"
+
+
+def _existing_values(session, table: str, col: str, values: list) -> set:
+    found = set()
+    stmt = text(EXISTING_VALUES_SQL.format(col=col, table=table)).bindparams(bindparam("vals", expanding=True))
+    for i in range(0, len(values), 500):
+        found.update(v for (v,) in session.execute(stmt, {"vals": values[i:i + 500]}))
+    return found
+
+
+def upsert_rows(session, table: str, cols: list[str], key: str, rows: list[dict],
+                fingerprint: str | None = None) -> UpsertResult:
+    if not rows:
+        return UpsertResult()
+
+    # last row wins for duplicate keys within a batch, same as the old staging PK would demand
+    rows = list({r[key]: r for r in rows}.values())
+
+    if session.get_bind().dialect.name == "postgresql":
+        return copy_upsert_rows(session, table, cols, key, rows, fingerprint)
+
+    # Rows whose fingerprint is already stored are identical; drop them before the upsert (indexed lookup)
+    unchanged = 0
+    if fingerprint:
+        seen = _existing_values(session, table, fingerprint, [r[fingerprint] for r in rows])
+        fresh = [r for r in rows if r[fingerprint] not in seen]
+        unchanged = len(rows) - len(fresh)
+        rows = fresh
+        if not rows:
+            return UpsertResult(unchanged=unchanged)
+
+    existing = len(_existing_values(session, table, key, [r[key] for r in rows]))
+    affected = session.execute(build_upsert(table, cols, key, fingerprint), rows).rowcount
+
+    inserted = len(rows) - existing
+    updated = max(affected - inserted, 0)
+    return UpsertResult(inserted=inserted, updated=updated, unchanged=unchanged + existing - updated)
+
+#--------------------------------------------
+
+#POSTGRES UPSERT (DATABASE_URL=postgresql+psycopg2://...)
+#
+# upsert_rows hands the batch to copy_upsert_rows on Postgres: the rows are streamed with
+# COPY FROM STDIN into a temp staging table, then merged with one INSERT ... SELECT ... ON CONFLICT.
+# Temp tables are unlogged and private to the connection, so the parallel tenant workers
+# (sync --all-tenants) never see each other's staged rows.
+
+_pg_column_types: dict = {}  # table -> {column: data_type}
+
+
+def _column_types(cur, table: str) -> dict:
+    if table not in _pg_column_types:
+        cur.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_name = %s", (table,))
+        _pg_column_types[table] = dict(cur.fetchall())
+    return _pg_column_types[table]
+
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def _copy_value(v, data_type: str) -> str:
+    # COPY text format. SQLite takes anything in any column; Postgres needs values that parse as the column type
+    if v is None or (v == "" and data_type != "text"):
+        return "\\N"  # transform fills missing dates with ""
+    if isinstance(v, bool):
+        v = int(v)  # what sqlite3 stores for a bool
+    elif isinstance(v, float) and data_type in ("integer", "bigint") and v.is_integer():
+        v = int(v)  # counts come out of pandas as floats when a column has gaps
+    return str(v).translate(COPY_ESCAPES)
+
+
+def _copy_text(v) -> str:
+    # fast path for text columns, which are most of them
+    if v.__class__ is str:
+        return v.translate(COPY_ESCAPES)
+    if v is None:
+        return "\\N"
+    return _copy_value(v, "text")
+
+
+def _copy_encoder(data_type: str):
+    if data_type == "text":
+        return _copy_text
+    return lambda v: _copy_value(v, data_type)
+
+
+def build_merge(table: str, cols: list[str], key: str, fingerprint: str | None = None) -> str:
+    """
+    Same rules as build_upsert, reading from the staging table. RETURNING (xmax = 0) is true
+    for inserted rows and false for updated ones; rows skipped by the WHERE return nothing.
+    """
+    non_key = [c for c in cols if c != key]
+    col_list = ", ".join(cols)
+    assignments = ",\n        ".join(f"{c} = excluded.{c}" for c in non_key)
+    compare = [fingerprint] if fingerprint else non_key
+    changed = "\n        OR ".join(f"{table}.{c} IS DISTINCT FROM excluded.{c}" for c in compare)
+    # a fingerprint already stored means the line is identical; those never reach ON CONFLICT
+    unseen = f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{fingerprint} = s.{fingerprint})" if fingerprint else ""
+    return f"""
+    INSERT INTO {table} ({col_list})
+    SELECT {col_list} FROM {table}_copy s
+    {unseen}
+    ON CONFLICT ({key}) DO UPDATE SET
+        {assignments}
+    WHERE {changed}
+    RETURNING (xmax = 0)
+    """
+
+
+def copy_upsert_rows(session, table: str, cols: list[str], key: str, rows: list[dict],
+                     fingerprint: str | None = None) -> UpsertResult:
+    # runs on the session's own connection, so it commits / rolls back with the rest of the batch
+    cur = session.connection().connection.cursor()
+    try:
+        cur.execute(f"""CREATE TEMP TABLE IF NOT EXISTS {table}_copy
+                       (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;
+                       TRUNCATE {table}_copy""")
+        types = _column_types(cur, table)
+        encoders = [(c, _copy_encoder(types.get(c, "text"))) for c in cols]
+        buf = io.StringIO()
+        for r in rows:
+            buf.write("\t".join([enc(r[c]) for c, enc in encoders]))
+            buf.write("\n")
+        buf.seek(0)
+        cur.copy_expert(f"COPY {table}_copy ({', '.join(cols)}) FROM STDIN", buf)
+
+        cur.execute(build_merge(table, cols, key, fingerprint))
+        merged = [is_insert for (is_insert,) in cur.fetchall()]
+    finally:
+        cur.close()
+
+    inserted = sum(merged)
+    updated = len(merged) - inserted
+    return UpsertResult(inserted=inserted, updated=updated, unchanged=len(rows) - len(merged))
+
+#--------------------------------------------
+
 #FOR TB
 
-INSERT_TB_CLIENT_STG = text("""INSERT INTO tb_client_stg (tenant_id, row_hash, date, section, label, debit, credit, accountid, accountcode) 
-VALUES (:tenant_id, :row_hash, :date, :section, :label, :debit, :credit, :accountid, :accountcode)
-""")
+TB_COLS = ["tenant_id", "row_hash", "date", "section", "label", "debit", "credit", "accountid", "accountcode",
+           "debit_cents", "credit_cents", "accountcode_int", "period_year", "period_month"]
 
 def load_TB(date_str: str):
 
     df = trigger_TB(date_str)
-    rows = df.to_dict(orient="records")
-
-    #GETS UPDATED ONCE STARTS INSERTING...
-    inserted = 0
+    rows = frame_rows(df, TB_COLS)
 
     # Does use transaction...
     with SessionLocal.begin() as session:
-        try:      
-            stmt=INSERT_TB_CLIENT_STG
-            session.execute(stmt, rows)
-            inserted = len(rows)
+        try:
+            result = upsert_rows(session, "tb_client", TB_COLS, "row_hash", rows)
+            session.commit()
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    return result,df
+
 
+def load_TB_many(dates: list[str]):
+    # every date in one transaction: either the whole close lands or none of it
+    df = trigger_TB_many(dates)
+    rows = frame_rows(df, TB_COLS)
 
-            session.execute(text("""
-            INSERT INTO tb_client(tenant_id, row_hash, date, section, label, debit, credit, accountid, accountcode)            
-            SELECT tenant_id, row_hash, date, section, label, debit, credit, accountid, accountcode from tb_client_stg
-            WHERE NOT EXISTS(
-            SELECT 1 FROM tb_client a 
-            WHERE a.row_hash=tb_client_stg.row_hash);""" ))
-
-            #Use staging table to maintain ids...
-            session.execute(text("""
-            UPDATE tb_client AS c
-            SET
-            tenant_id    = s.tenant_id,
-            date        = s.date,
-            section     = s.section,
-            label       = s.label,
-            debit       = s.debit,
-            credit      = s.credit,
-            accountid   = s.accountid,
-            accountcode = s.accountcode
-            FROM tb_client_stg AS s
-            WHERE s.row_hash = c.row_hash;""" ))
-
-
-            # Delete from staging table...
-            session.execute(text("""DELETE FROM tb_client_stg""" ))
+    with SessionLocal.begin() as session:
+        try:
+            result = upsert_rows(session, "tb_client", TB_COLS, "row_hash", rows)
             session.commit()
-            
+
         except SQLAlchemyError:
             session.rollback()
             raise
 
-    return inserted,df
+    return result,df
 
 #------------------------------------------------------------------------------------------------------------------------------------------
 
 #FOR PnL
 
-
-INSERT_PNL_CLIENT_STG = text("""
-INSERT INTO pnl_client_stg (tenant_id, row_hash, date, section, label, amount, issummary, accountid) 
-VALUES (:tenant_id, :row_hash, :date, :section, :label, :amount, :issummary, :accountid)
-""")
+PNL_COLS = ["tenant_id", "row_hash", "date", "section", "label", "amount", "issummary", "accountid", "amount_cents",
+            "period_year", "period_month"]
 
 def load_PNL(from_date: str, to_date: str, period: str | None = None, timeframe: int | None = None):
 
     df = trigger_pnl(from_date, to_date, period=period, timeframe=timeframe)
-    rows = df.to_dict(orient="records")
-
-    inserted = 0
+    rows = frame_rows(df, PNL_COLS)
 
     with SessionLocal.begin() as session:
         try:
-            session.execute(INSERT_PNL_CLIENT_STG, rows)
-            inserted = len(rows)
-
-            session.execute(text("""
-                INSERT INTO pnl_client(tenant_id, row_hash, date, section, label, amount, issummary, accountid)
-                SELECT tenant_id, row_hash, date, section, label, amount, issummary, accountid
-                FROM pnl_client_stg
-                WHERE NOT EXISTS (
-                SELECT 1 FROM pnl_client a WHERE a.row_hash = pnl_client_stg.row_hash);"""))
-
-            # 3) Update existing rows in final from staging (match on row_hash)
-            session.execute(text("""
-                UPDATE pnl_client AS c
-                SET
-                    tenant_id   = s.tenant_id,
-                    date       = s.date,
-                    section    = s.section,
-                    label      = s.label,
-                    amount     = s.amount,
-                    issummary  = s.issummary,
-                    accountid  = s.accountid
-                FROM pnl_client_stg AS s
-                WHERE s.row_hash = c.row_hash;"""))
-            session.execute(text("DELETE FROM pnl_client_stg"))
-
+            result = upsert_rows(session, "pnl_client", PNL_COLS, "row_hash", rows)
             session.commit()
 
         except SQLAlchemyError:
             session.rollback()
             raise
 
-    return inserted,df
+    return result,df
 
 #------------------------------------------------------------------------------------------------------------------------------------------
 
 #FOR Journals
 
+# All columns even when clients dont produce
+JOURNAL_COLS = [
+    "tenant_id","journallineid","referencenumber","journalid","journaldate",
+    "accountid","accountcode","accounttype","accountname",
+    "description","sourcetype","reference","netamount","grossamount",
+    "taxamount","taxtype","taxname","debit","credit","createddateutc",
+    "trackingcategoriescount",
+    "trackingcategory1_name","trackingcategory1_option",
+    "trackingcategory1_trackingcategoryid","trackingcategory1_trackingoptionid",
+    "trackingcategory2_name","trackingcategory2_option",
+    "trackingcategory2_trackingcategoryid","trackingcategory2_trackingoptionid",
+    "row_fingerprint",
+    "netamount_cents","grossamount_cents","taxamount_cents","debit_cents","credit_cents",
+    "accountcode_int","referencenumber_int","period_year","period_month",
+]
 
-INSERT_JOURNALS_STG = text("""
-INSERT INTO journalsrawstg (
-
-    tenant_id, journallineid, referencenumber, journalid, journaldate,
-    accountid, accountcode, accounttype, accountname,
-    description, sourcetype, reference, netamount, grossamount,
-    taxamount, taxtype, taxname, debit, credit, createddateutc,
-    trackingcategoriescount,
-    trackingcategory1_name, trackingcategory1_option,
-    trackingcategory1_trackingcategoryid, trackingcategory1_trackingoptionid,
-    trackingcategory2_name, trackingcategory2_option,
-    trackingcategory2_trackingcategoryid, trackingcategory2_trackingoptionid
-)
-VALUES (
-    :tenant_id, :journallineid, :referencenumber, :journalid, :journaldate,
-    :accountid, :accountcode, :accounttype, :accountname,
-    :description, :sourcetype, :reference, :netamount, :grossamount,
-    :taxamount, :taxtype, :taxname, :debit, :credit, :createddateutc,
-    :trackingcategoriescount,
-    :trackingcategory1_name, :trackingcategory1_option,
-    :trackingcategory1_trackingcategoryid, :trackingcategory1_trackingoptionid,
-    :trackingcategory2_name, :trackingcategory2_option,
-    :trackingcategory2_trackingcategoryid, :trackingcategory2_trackingoptionid
-)
-""")
-
+# Rows upserted per transaction; peak memory scales with this, not the ledger
+JOURNAL_BATCH_SIZE = int(os.environ.get("JOURNAL_BATCH_SIZE", "5000"))
 
-def load_JOURNALS():
 
-    df = trigger_journals()
+def journal_rows(df: pd.DataFrame) -> list[dict]:
+    return frame_rows(df, JOURNAL_COLS)
 
-    # All columns even when clients dont produce
-    expected_cols = [
-        "tenant_id","journallineid","referencenumber","journalid","journaldate",
-        "accountid","accountcode","accounttype","accountname",
-        "description","sourcetype","reference","netamount","grossamount",
-        "taxamount","taxtype","taxname","debit","credit","createddateutc",
-        "trackingcategoriescount",
-        "trackingcategory1_name","trackingcategory1_option",
-        "trackingcategory1_trackingcategoryid","trackingcategory1_trackingoptionid",
-        "trackingcategory2_name","trackingcategory2_option",
-        "trackingcategory2_trackingcategoryid","trackingcategory2_trackingoptionid",
-    ]
-    for c in expected_cols:
-        if c not in df.columns:
-            df[c] = None  # create the column so keys exist in dicts
 
-    # For fullproof checks
-    df = df.where(df.notnull(), None)
+HIGH_WATER_SQL = text("SELECT MAX(referencenumber_int) FROM journalsraw WHERE tenant_id = :tenant_id")
 
-    rows = df[expected_cols].to_dict(orient="records")  # preserve consistent key set & order
 
-    inserted = 0
+def write_journal_batch(rows: list[dict]) -> UpsertResult:
 
     with SessionLocal.begin() as session:
         try:
-            # 1) Insert into staging
-            session.execute(INSERT_JOURNALS_STG, rows)
-            inserted = len(rows)
+            result = upsert_rows(session, "journalsraw", JOURNAL_COLS, "journallineid", rows,
+                                 fingerprint="row_fingerprint")
 
-            # 2) Insert new rows into final if journallineid does not exist
-            session.execute(text("""
-                INSERT INTO journalsraw (
-                    tenant_id,
-                    journallineid, referencenumber, journalid, journaldate,
-                    accountid, accountcode, accounttype, accountname,
-                    description, sourcetype, reference, netamount, grossamount,
-                    taxamount, taxtype, taxname, debit, credit, createddateutc,
-                    trackingcategoriescount,
-                    trackingcategory1_name, trackingcategory1_option,
-                    trackingcategory1_trackingcategoryid, trackingcategory1_trackingoptionid,
-                    trackingcategory2_name, trackingcategory2_option,
-                    trackingcategory2_trackingcategoryid, trackingcategory2_trackingoptionid
-                )
-                SELECT
-                    tenant_id,
-                    journallineid, referencenumber, journalid, journaldate,
-                    accountid, accountcode, accounttype, accountname,
-                    description, sourcetype, reference, netamount, grossamount,
-                    taxamount, taxtype, taxname, debit, credit, createddateutc,
-                    trackingcategoriescount,
-                    trackingcategory1_name, trackingcategory1_option,
-                    trackingcategory1_trackingcategoryid, trackingcategory1_trackingoptionid,
-                    trackingcategory2_name, trackingcategory2_option,
-                    trackingcategory2_trackingcategoryid, trackingcategory2_trackingoptionid
-                FROM journalsrawstg
-                WHERE NOT EXISTS (
-                    SELECT 1 FROM journalsraw j WHERE j.journallineid = journalsrawstg.journallineid
-                );
-            """))
-
-            # 3) Update matching rows (by journallineid)
-            session.execute(text("""
-                UPDATE journalsraw AS j
-                SET
-                    tenant_id    = s.tenant_id,
-                    referencenumber = s.referencenumber,
-                    journalid = s.journalid,
-                    journaldate = s.journaldate,
-                    accountid = s.accountid,
-                    accountcode = s.accountcode,
-                    accounttype = s.accounttype,
-                    accountname = s.accountname,
-                    description = s.description,
-                    sourcetype = s.sourcetype,
-                    reference = s.reference,
-                    netamount = s.netamount,
-                    grossamount = s.grossamount,
-                    taxamount = s.taxamount,
-                    taxtype = s.taxtype,
-                    taxname = s.taxname,
-                    debit = s.debit,
-                    credit = s.credit,
-                    createddateutc = s.createddateutc,
-                    trackingcategoriescount = s.trackingcategoriescount,
-                    trackingcategory1_name = s.trackingcategory1_name,
-                    trackingcategory1_option = s.trackingcategory1_option,
-                    trackingcategory1_trackingcategoryid = s.trackingcategory1_trackingcategoryid,
-                    trackingcategory1_trackingoptionid = s.trackingcategory1_trackingoptionid,
-                    trackingcategory2_name = s.trackingcategory2_name,
-                    trackingcategory2_option = s.trackingcategory2_option,
-                    trackingcategory2_trackingcategoryid = s.trackingcategory2_trackingcategoryid,
-                    trackingcategory2_trackingoptionid = s.trackingcategory2_trackingoptionid
-                FROM journalsrawstg AS s
-                WHERE s.journallineid = j.journallineid;
-            """))
-
-            # 4) Clear staging
-            session.execute(text("DELETE FROM journalsrawstg"))
+            # Move the high-water mark to the highest journal number now stored,
+            # per batch so an interrupted run resumes where it stopped
+            high_water = session.execute(
+                HIGH_WATER_SQL,
+                {"tenant_id": get_tenant_id()},
+            ).scalar()
+            set_sync_state(session, "Journals", high_water=high_water)
 
             session.commit()
 
@@ -300,263 +397,243 @@ def load_JOURNALS():
             session.rollback()
             raise
 
-    return inserted, df
+    return result
+
+
+def journal_offset(full: bool = False) -> int:
+    # Incremental by default: start paging after the highest JournalNumber already loaded
+    if full:
+        return 0
+    return get_sync_state("Journals")["high_water"] or 0
+
+
+def load_JOURNALS(full: bool = False):
+
+    # Streams page -> flatten -> transform -> upsert; nothing holds the whole ledger
+    result = UpsertResult()
+    batch: list[dict] = []
+
+    for df in iter_journals(journal_offset(full)):
+        batch.extend(journal_rows(df))
+        if len(batch) >= JOURNAL_BATCH_SIZE:
+            result += write_journal_batch(batch)
+            batch = []
+
+    if batch:
+        result += write_journal_batch(batch)
+
+    return result, None
 
 #------------------------------------------------------------------------------------------------------------------
 
 # FOR Manual journals
 
+MANUALJOURNAL_COLS = [
+    "tenant_id",
+    "manualjournalid",
+    "status",
+    "description",
+    "date",
+    "updateddateutc",
+    "lineamounttypes",
+    "showoncashbasisreports",
+    "hasattachments"]
+
+MANUALJOURNAL_LINE_COLS = [
+    "tenant_id",
+    "linekey",
+    "manualjournalid",
+    "lineindex",
+    "description",
+    "lineamount",
+    "accountid",
+    "accountcode",
+    "taxtype",
+    "taxamount",
+    "isblank",
+    "trackingcount",
+    "tracking1_name",
+    "tracking1_option",
+    "tracking2_name",
+    "tracking2_option",
+    "lineamount_cents",
+    "taxamount_cents"]
+
+# An edited journal can come back with fewer lines; the tail it no longer has is removed
+DELETE_STALE_MJ_LINES = text("""DELETE FROM manualjournallinesraw
+WHERE manualjournalid = :manualjournalid AND lineindex >= :n
+""")
 
-INSERT_MANUALJOURNALS_STG = text("""
-INSERT INTO manualjournalsstg (
-    tenant_id,
-    manualjournalid,
-    status,
-    description,
-    date,
-    updateddateutc,
-    lineamounttypes,
-    showoncashbasisreports,
-    hasattachments
-    )
-    VALUES (
-    :tenant_id,
-    :manualjournalid,
-    :status,
-    :description,
-    :date,
-    :updateddateutc,
-    :lineamounttypes,
-    :showoncashbasisreports,
-    :hasattachments
-    )
-    
-    """)
 
+def manualjournal_since(full: bool = False) -> tuple[str | None, str]:
 
-def load_MANUALJOURNALS():
+    # Delta by default: only journals changed since the last successful sync.
+    # The timestamp is taken before the fetch so edits made during the run are picked up next time.
+    sync_started = utc_now()
+    modified_since = None if full else get_sync_state("ManualJournals")["last_sync_utc"]
+    return modified_since, sync_started
 
-    df = trigger_manualjournals()
-    rows = df.to_dict(orient="records")
 
-    # GETS UPDATED ONCE STARTS INSERTING...
-    inserted = 0
+def write_MANUALJOURNALS(df: pd.DataFrame, lines: pd.DataFrame,
+                         sync_started: str | None = None) -> tuple[UpsertResult, UpsertResult]:
+    # One page of journals + lines -> (journals, lines) results. sync_started goes with the last
+    # write only, so an interrupted run asks Xero for the same ModifiedSince window again.
+
+    rows = frame_rows(df, MANUALJOURNAL_COLS) if not df.empty else []
+    line_rows = frame_rows(lines, MANUALJOURNAL_LINE_COLS) if not lines.empty else []
+    if rows:
+        counts = lines.groupby("manualjournalid").size() if not lines.empty else pd.Series(dtype=int)
+        stale = [{"manualjournalid": r["manualjournalid"], "n": int(counts.get(r["manualjournalid"], 0))} for r in rows]
 
-    # Uses transaction...
+    # Uses transaction... journals and their lines land together
     with SessionLocal.begin() as session:
         try:
-            stmt = INSERT_MANUALJOURNALS_STG
-            session.execute(stmt, rows)
-            inserted = len(rows)
-
-            session.execute(text("""
-            INSERT INTO manualjournalsraw(
-                tenant_id,
-                manualjournalid,
-                status,
-                description,
-                date,
-                updateddateutc,
-                lineamounttypes,
-                showoncashbasisreports,
-                hasattachments
-            )
-            SELECT 
-                tenant_id,
-                manualjournalid,
-                status,
-                description,
-                date,
-                updateddateutc,
-                lineamounttypes,
-                showoncashbasisreports,
-                hasattachments
-            FROM manualjournalsstg
-            WHERE NOT EXISTS(
-                SELECT 1 FROM manualjournalsraw a
-                WHERE a.manualjournalid = manualjournalsstg.manualjournalid
-            );
-            """))
-
-            session.execute(text("""
-            UPDATE manualjournalsraw AS c
-            SET
-                tenant_id               = s.tenant_id,
-                status                 = s.status,
-                description            = s.description,
-                date                   = s.date,
-                updateddateutc         = s.updateddateutc,
-                lineamounttypes        = s.lineamounttypes,
-                showoncashbasisreports = s.showoncashbasisreports,
-                hasattachments         = s.hasattachments
-            FROM manualjournalsstg AS s
-            WHERE s.manualjournalid = c.manualjournalid;
-            """))
-
-            session.execute(text("DELETE FROM manualjournalsstg"))
+            result = upsert_rows(session, "manualjournalsraw", MANUALJOURNAL_COLS, "manualjournalid", rows)
+            line_result = upsert_rows(session, "manualjournallinesraw", MANUALJOURNAL_LINE_COLS, "linekey", line_rows)
+            if rows:
+                session.execute(DELETE_STALE_MJ_LINES, stale)
+            if sync_started is not None:
+                set_sync_state(session, "ManualJournals", last_sync_utc=sync_started)
             session.commit()
 
         except SQLAlchemyError:
             session.rollback()
             raise
 
-    return inserted, df
+    return result, line_result
+
+
+def load_MANUALJOURNALS(full: bool = False):
+
+    # Streams page -> flatten -> transform -> upsert like journals; nothing holds the whole tenant.
+    # Returns (journals, lines) results; there is no frame to hand back.
+    modified_since, sync_started = manualjournal_since(full)
+    result, line_result = UpsertResult(), UpsertResult()
+    for df, lines in iter_manualjournals(modified_since):
+        r, lr = write_MANUALJOURNALS(df, lines)
+        result, line_result = result + r, line_result + lr
+
+    # every page is in: move the delta mark
+    write_MANUALJOURNALS(pd.DataFrame(), pd.DataFrame(), sync_started)
+    return result, line_result
 
 
     #---------------------------------------------------------------------------------------------------------------
 
     # FOR ACCOUNTS
 
-INSERT_ACCOUNTS_STG = text("""
-INSERT INTO accountsstg (
-    tenant_id,
-    accountid,
-    code,
-    name,
-    status,
-    type,
-    taxtype,
-    class,
-    enablepaymentstoaccount,
-    showinexpenseclaims,
-    bankaccountnumber,
-    bankaccounttype,
-    currencycode,
-    reportingcode,
-    reportingcodename,
-    hasattachments,
-    addtowatchlist,
-    updateddateutc,
-    description,
-    reportingname,
-    systemaccount
-)
-VALUES (
-    :tenant_id,
-    :accountid,
-    :code,
-    :name,
-    :status,
-    :type,
-    :taxtype,
-    :class,
-    :enablepaymentstoaccount,
-    :showinexpenseclaims,
-    :bankaccountnumber,
-    :bankaccounttype,
-    :currencycode,
-    :reportingcode,
-    :reportingcodename,
-    :hasattachments,
-    :addtowatchlist,
-    :updateddateutc,
-    :description,
-    :reportingname,
-    :systemaccount)""")
-
-
-def load_ACCOUNTS():
-    df = trigger_account()
-    rows = df.to_dict(orient="records")
-
-    inserted = 0
+ACCOUNT_COLS = [
+    "tenant_id",
+    "accountid",
+    "code",
+    "name",
+    "status",
+    "type",
+    "taxtype",
+    "class",
+    "enablepaymentstoaccount",
+    "showinexpenseclaims",
+    "bankaccountnumber",
+    "bankaccounttype",
+    "currencycode",
+    "reportingcode",
+    "reportingcodename",
+    "hasattachments",
+    "addtowatchlist",
+    "updateddateutc",
+    "description",
+    "reportingname",
+    "systemaccount"]
+
+
+def fetch_ACCOUNTS(full: bool = False):
+    # Delta by default, same as manual journals
+    sync_started = utc_now()
+    modified_since = None if full else get_sync_state("Accounts")["last_sync_utc"]
+
+    return trigger_account(modified_since), sync_started
+
+
+def write_ACCOUNTS(df: pd.DataFrame, sync_started: str) -> UpsertResult:
+    rows = frame_rows(df, ACCOUNT_COLS) if not df.empty else []
 
     with SessionLocal.begin() as session:
         try:
-            stmt = INSERT_ACCOUNTS_STG
-            session.execute(stmt, rows)
-            inserted = len(rows)
+            # Anything new is added on a CI level, changed accounts (deleted/archived etc.) are updated...
+            result = upsert_rows(session, "accountsraw", ACCOUNT_COLS, "accountid", rows)
+            set_sync_state(session, "Accounts", last_sync_utc=sync_started)
+            session.commit()
+
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+
+    return result
+
+
+def load_ACCOUNTS(full: bool = False):
+    df, sync_started = fetch_ACCOUNTS(full)
+    return write_ACCOUNTS(df, sync_started), df
+
+    #----------------------------------------------------------------------------------------------------------------------------
 
-            # Anything new is added on a CI level...
-            session.execute(text("""
-            INSERT INTO accountsraw (
-                tenant_id,
-                accountid,
-                code,
-                name,
-                status,
-                type,
-                taxtype,
-                class,
-                enablepaymentstoaccount,
-                showinexpenseclaims,
-                bankaccountnumber,
-                bankaccounttype,
-                currencycode,
-                reportingcode,
-                reportingcodename,
-                hasattachments,
-                addtowatchlist,
-                updateddateutc,
-                description,
-                reportingname,
-                systemaccount
-            )
-            SELECT
-                tenant_id,
-                accountid,
-                code,
-                name,
-                status,
-                type,
-                taxtype,
-                class,
-                enablepaymentstoaccount,
-                showinexpenseclaims,
-                bankaccountnumber,
-                bankaccounttype,
-                currencycode,
-                reportingcode,
-                reportingcodename,
-                hasattachments,
-                addtowatchlist,
-                updateddateutc,
-                description,
-                reportingname,
-                systemaccount
-            FROM accountsstg
-            WHERE NOT EXISTS (
-                SELECT 1 FROM accountsraw a
-                WHERE a.accountid = accountsstg.accountid
-            );
-            """))
-
-            # Uploaded data is updated, if an account is deleted or something...
-            session.execute(text("""
-            UPDATE accountsraw AS c
-            SET
-                tenant_id               = s.tenant_id,
-                code                    = s.code,
-                name                    = s.name,
-                status                  = s.status,
-                type                    = s.type,
-                taxtype                 = s.taxtype,
-                class                   = s.class,
-                enablepaymentstoaccount = s.enablepaymentstoaccount,
-                showinexpenseclaims     = s.showinexpenseclaims,
-                bankaccountnumber       = s.bankaccountnumber,
-                bankaccounttype         = s.bankaccounttype,
-                currencycode            = s.currencycode,
-                reportingcode           = s.reportingcode,
-                reportingcodename       = s.reportingcodename,
-                hasattachments          = s.hasattachments,
-                addtowatchlist          = s.addtowatchlist,
-                updateddateutc          = s.updateddateutc,
-                description             = s.description,
-                reportingname           = s.reportingname,
-                systemaccount           = s.systemaccount
-            FROM accountsstg AS s
-            WHERE s.accountid = c.accountid;
-            """))
-
-
-            session.execute(text("DELETE FROM accountsstg"))
+
+#---------------------------------------------------------------------------------------------------------------
+
+# FOR BANK TRANSACTIONS
+
+BANKTRANS_COLS = [
+    "tenant_id",
+    "banktransactionid",
+    "type",
+    "direction",
+    "istransfer",
+    "reference",
+    "status",
+    "isreconciled",
+    "hasattachments",
+    "lineamounttypes",
+    "subtotal",
+    "totaltax",
+    "total",
+    "currencycode",
+    "currencyrate",
+    "date",
+    "updateddateutc",
+    "bankaccountid",
+    "bankaccountcode",
+    "bankaccountname",
+    "contactid",
+    "contactname"]
+
+
+def write_banktrans_batch(rows: list[dict]) -> UpsertResult:
+
+    with SessionLocal.begin() as session:
+        try:
+            result = upsert_rows(session, "banktransactionsraw", BANKTRANS_COLS, "banktransactionid", rows)
             session.commit()
 
         except SQLAlchemyError:
             session.rollback()
             raise
 
-    return inserted, df
+    return result
+
+
+def load_BANKTRANS(start_date: str, end_date: str, window_days: int | None = None):
+
+    # Same streaming shape as journals: window -> flatten -> transform -> upsert in batches
+    result = UpsertResult()
+    batch: list[dict] = []
+
+    for df in iter_banktrans(start_date, end_date, window_days):
+        batch.extend(frame_rows(df, BANKTRANS_COLS))
+        if len(batch) >= JOURNAL_BATCH_SIZE:
+            result += write_banktrans_batch(batch)
+            batch = []
+
+    if batch:
+        result += write_banktrans_batch(batch)
 
-    #----------------------------------------------------------------------------------------------------------------------------
\ No newline at end of file
+    return result, None
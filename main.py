@@ -3,32 +3,73 @@
 
 import argparse
 from bootstrap import ensure_schema
-from insertions import load_TB, load_PNL, load_JOURNALS, load_MANUALJOURNALS, master_load, load_ACCOUNTS
+from insertions import load_TB, load_TB_many, load_PNL, load_JOURNALS, load_MANUALJOURNALS, master_load, load_ACCOUNTS, load_BANKTRANS
 from pnl_comp import run_pandasql_transform
 from gsheet import sheetdump
+from xeroclient import print_stats
+from sync import run_sync, run_sync_all, TENANT_WORKERS
+from xerotokens import set_tenant_id
+from transform import tb_dates, tb_wide, TB_EVERY
+import xerocache
 
 
 def build_parser() -> argparse.ArgumentParser:
-    p = argparse.ArgumentParser(description="Run TB or PnL or journal or manualjournal or account ETL")
+    p = argparse.ArgumentParser(description="Run TB or PnL or journal or manualjournal or account ETL, or a full sync")
+    p.add_argument("--record", action="store_true",
+                   help="Live run that also stores every Xero response on disk (xerocache) for a later --replay")
+    p.add_argument("--replay", action="store_true",
+                   help="Serve every Xero call from the on-disk response cache (no network, sheets go to CSV). "
+                        "Pair with --full on journal/manualjournal/account so requests match what was recorded")
+    p.add_argument("--tenant", default=None,
+                   help="Xero tenant id to work on (default: tenant_id env, then xero_tokens.json)")
     sub = p.add_subparsers(dest="report", required=True)
 
     # Journal command: requires no argument. Historic sink...
     journal=sub.add_parser("journal", help="Journal run")
+    journal.add_argument("--full", action="store_true",
+                         help="Ignore the stored high-water mark and resync every journal")
 
     manualjournal=sub.add_parser("manualjournal", help="manualJournal run")
+    manualjournal.add_argument("--full", action="store_true",
+                               help="Skip If-Modified-Since and pull every manual journal")
 
     account=sub.add_parser("account", help="account run")
-
-    # TB subcommand: requires a single date
+    account.add_argument("--full", action="store_true",
+                         help="Skip If-Modified-Since and pull every account")
+
+    # Bank transactions: date range cut into windows, each paged, all upserted into banktransactionsraw
+    banktrans = sub.add_parser("banktrans", help="Bank transactions run")
+    banktrans.add_argument("from_date", help="Start date (YYYY-MM-DD)")
+    banktrans.add_argument("to_date", help="End date (YYYY-MM-DD)")
+    banktrans.add_argument("--window-days", type=int, default=None,
+                           help="Days per request window (default BANK_WINDOW_DAYS, 31)")
+
+    # Sync: accounts + manual journals + journals fetched together, then the expense build
+    sync = sub.add_parser("sync", help="Fetch Accounts, ManualJournals and Journals concurrently, then build expenses")
+    sync.add_argument("--full", action="store_true",
+                      help="Ignore stored sync state for every endpoint")
+    sync.add_argument("--no-expense", action="store_true",
+                      help="Load the raw tables only, skip shielded_expense")
+    sync.add_argument("--all-tenants", action="store_true",
+                      help="Sync every organisation on /connections, each in its own worker process")
+    sync.add_argument("--workers", type=int, default=TENANT_WORKERS,
+                      help="Tenants synced at the same time with --all-tenants")
+
+    # TB subcommand: a single date, or a range of period ends
     tb = sub.add_parser("tb", help="Trial Balance run")
-    tb.add_argument("date", help="As-of date (YYYY-MM-DD)")
+    tb.add_argument("date", nargs="?", help="As-of date (YYYY-MM-DD)")
+    tb.add_argument("--from", dest="from_date", help="First date of a batch run (YYYY-MM-DD)")
+    tb.add_argument("--to", dest="to_date", help="Last date of a batch run (YYYY-MM-DD)")
+    tb.add_argument("--every", choices=sorted(TB_EVERY), default="month-end",
+                    help="Which dates between --from and --to get a TB")
 
     # PnL subcommand: requires from_date and to_date + optional periods/timeframe
     pnl = sub.add_parser("pnl", help="Profit & Loss run")
     pnl.add_argument("from_date", help="Start date (YYYY-MM-DD)")
     pnl.add_argument("to_date", help="End date (YYYY-MM-DD)")
     pnl.add_argument("--periods", type=int, default=None,
-                     help="Last N periods ending at to_date (e.g., 2)")
+                     help="Comparative periods before from_date..to_date (e.g., 2). Above 11 the range "
+                          "is split into several Xero requests fetched in parallel")
     pnl.add_argument("--timeframe", choices=["MONTH", "QUARTER", "YEAR"], default=None,
                      help="Unit for --periods (e.g., MONTH). If omitted, your loader can default.")
 
@@ -37,14 +78,33 @@ def build_parser() -> argparse.ArgumentParser:
 
 def main():
     ensure_schema()
-    args = build_parser().parse_args()
+    parser = build_parser()
+    args = parser.parse_args()
+    if args.report == "tb" and not args.date and not (args.from_date and args.to_date):
+        parser.error("tb needs a date, or --from and --to")
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    if args.record:
+        xerocache.set_mode("record")
+    if args.replay:
+        xerocache.set_mode("replay")
+    if args.tenant:
+        set_tenant_id(args.tenant)
 
     master_inserted, master_df = master_load()
     print(master_df)
 
-    if args.report == "tb":
+    if args.report == "tb" and not args.date:
+        dates = tb_dates(args.from_date, args.to_date, args.every)
+        if not dates:
+            parser.error(f"no {args.every} dates between {args.from_date} and {args.to_date}")
+        inserted, df = load_TB_many(dates)
+        print(f"Upserted rows TB ({len(dates)} dates {dates[0]}..{dates[-1]}): {inserted}")
+        sheetdump(tb_wide(df), "tb_wide")
+
+    elif args.report == "tb":
         inserted, df = load_TB(args.date)
-        print(f"Inserted rows TB: {inserted}")
+        print(f"Upserted rows TB: {inserted}")
         try:
             sheetdump(df,"tb")
         except Exception:
@@ -57,36 +117,44 @@ def main():
             period=args.periods,     # your load_PNL uses (period=unit, timeframe=count)
             timeframe=args.timeframe
         )
-        print(f"Inserted rows PnL: {inserted}")
+        print(f"Upserted rows PnL: {inserted}")
 
         final=run_pandasql_transform(df,args.to_date)
         sheetdump(final,"pnl")
 
     elif args.report == "journal":
-        inserted, df = load_JOURNALS()
-        print(f"Inserted rows journals: {inserted}")
+        # streamed straight into the database, so there is no frame to print
+        inserted, _ = load_JOURNALS(full=args.full)
+        print(f"Upserted rows journals: {inserted}")
 
-        #final=run_pandasql_transform(df,args.to_date)
-        #sheetdump(final,"pnl")
-        print(df)
 
+    elif args.report == "banktrans":
+        # streamed straight into the database, like journals
+        inserted, _ = load_BANKTRANS(args.from_date, args.to_date, window_days=args.window_days)
+        print(f"Upserted rows banktransactions: {inserted}")
 
     elif args.report == "manualjournal":
-        inserted, df = load_MANUALJOURNALS()
-        print(f"Inserted rows manualjournals: {inserted}")
+        # streamed page by page like journals, so there is no frame to print
+        inserted, lines_inserted = load_MANUALJOURNALS(full=args.full)
+        print(f"Upserted rows manualjournals: {inserted}")
+        print(f"Upserted rows manualjournallines: {lines_inserted}")
 
-        #final=run_pandasql_transform(df,args.to_date)
-        #sheetdump(final,"pnl")
-        print(df)
+    elif args.report == "sync" and args.all_tenants:
+        run_sync_all(full=args.full, expense=not args.no_expense, workers=args.workers)
+
+    elif args.report == "sync":
+        run_sync(full=args.full, expense=not args.no_expense)
 
     elif args.report == "account":
-        inserted, df = load_ACCOUNTS()
-        print(f"Inserted rows accounts: {inserted}")
+        inserted, df = load_ACCOUNTS(full=args.full)
+        print(f"Upserted rows accounts: {inserted}")
 
         #final=run_pandasql_transform(df,args.to_date)
         #sheetdump(final,"pnl")
         print(df)
 
+    print_stats()
+
 
 if __name__ == "__main__":
     main()
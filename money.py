@@ -0,0 +1,65 @@
+import pandas as pd
+
+# Money as integer cents (64-bit minor units).
+#
+# Amounts are stored twice: the *_cents BIGINT columns are exact and are what sums, pivots and
+# GROUP BYs run on; the float columns next to them stay for display (sheets, older queries).
+# Conversion is done once per column at transform time, never per cell.
+
+# report cells look like "1,234.56", "(1,234.56)" for negatives, sometimes with a currency sign
+_NOISE = r"[,$£€\s]"
+
+
+def to_cents(values) -> pd.Series:
+    """Amounts (JSON numbers or Xero report strings) -> Int64 cents; blanks and junk -> <NA>."""
+    s = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(s) and not pd.api.types.is_bool_dtype(s):
+        num = s.astype("float64")
+    else:
+        # Xero mostly sends plain "1234.56"; only cells that do not parse get the string clean-up
+        num = pd.to_numeric(s, errors="coerce").astype("float64")
+        messy = num.isna() & s.notna()
+        if messy.any():
+            txt = s[messy].astype(str).str.strip()
+            neg = txt.str.startswith("(") & txt.str.endswith(")")
+            txt = txt.str.strip("()").str.replace(_NOISE, "", regex=True)
+            fixed = pd.to_numeric(txt, errors="coerce").astype("float64")
+            num[messy] = fixed.where(~neg, -fixed)
+    # x * 100 is within half a cent of the true value for any 2dp amount below ~10^13, so round() is exact
+    return (num * 100).round().astype("Int64")
+
+
+def from_cents(cents) -> pd.Series:
+    """Int64 cents -> float64 amounts (NaN for <NA>); 123450 -> 1234.5, the same float as float("1234.50")."""
+    return pd.Series(cents).astype("float64") / 100
+
+
+if __name__ == "__main__":
+    # Float drift vs integer cents on a large ledger: python money.py [rows]
+    import sys
+    import time
+    import numpy as np
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    amounts = pd.Series(rng.integers(-10_000_000, 10_000_000, n) / 100)  # 2dp, like journal lines
+    plain = amounts.map(lambda v: f"{v:.2f}")  # what the report API sends
+    formatted = amounts.map(lambda v: f"({-v:,.2f})" if v < 0 else f"{v:,.2f}")
+    exact = sum(int(round(v * 100)) for v in amounts.tolist())
+
+    for name, text in (("plain", plain), ("formatted", formatted)):
+        t0 = time.perf_counter()
+        cents = to_cents(text)
+        parse = time.perf_counter() - t0
+        assert int(cents.sum()) == exact
+        print(f"to_cents on {n} {name} report strings: {parse:.2f}s ({n / parse:,.0f}/s)")
+
+    t0 = time.perf_counter()
+    float_total = amounts.sum()
+    t_float = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    cents_total = int(cents.sum())
+    t_cents = time.perf_counter() - t0
+
+    print(f"float sum  {float_total:,.6f}  off by {abs(float_total * 100 - exact):.6f} cents  {t_float * 1000:.1f}ms")
+    print(f"cents sum  {cents_total / 100:,.2f}  off by {abs(cents_total - exact)} cents  {t_cents * 1000:.1f}ms")
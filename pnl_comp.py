@@ -1,5 +1,6 @@
 import pandas as pd
 from pandasql import sqldf
+from money import from_cents
 
 def dump(df: pd.DataFrame, from_date: str) -> pd.DataFrame:
 
@@ -11,18 +12,20 @@ def dump(df: pd.DataFrame, from_date: str) -> pd.DataFrame:
 def run_pandasql_transform(df: pd.DataFrame, from_date: str) -> pd.DataFrame:
 
 
+    # grouped and summed on integer cents; amounts go back to floats only for the sheet
     q_dedup = """
-        SELECT date, label, section, amount, issummary, accountid FROM df
-        GROUP BY date, label, section, amount, issummary, accountid
+        SELECT date, label, section, amount_cents, issummary, accountid FROM df
+        GROUP BY date, label, section, amount_cents, issummary, accountid
     """
     df_dedup = sqldf(q_dedup, {"df": df})
+    df_dedup.insert(3, "amount", from_cents(df_dedup.pop("amount_cents")))
 
-    # 2) Filter out rows in the same YYYY-MM as from_date
-    month_prefix = from_date[:7]  # 'YYYY-MM'
+    # 2) Filter out rows in the same YYYY-MM as from_date (integer period columns, no substr per row)
+    year, month = int(from_date[:4]), int(from_date[5:7])
     q_df1 = f"""
         SELECT *
         FROM df
-        WHERE substr(date, 1, 7) != '{month_prefix}'
+        WHERE period_year IS NULL OR NOT (period_year = {year} AND period_month = {month})
     """
     df1 = sqldf(q_df1, {"df": df})
     #---------------------------------------------------------------------------
@@ -34,13 +37,15 @@ def run_pandasql_transform(df: pd.DataFrame, from_date: str) -> pd.DataFrame:
             .pivot_table(
                index=["label", "section", "issummary"],
                columns="date",
-               values="amount",
+               values="amount_cents",
                aggfunc="sum"
             ).reset_index())
 
         # Optional: order date columns
     fixed = ["label", "section", "issummary"]
     date_cols = sorted([c for c in df1_pivot.columns if c not in fixed])
+    for c in date_cols:
+        df1_pivot[c] = from_cents(df1_pivot[c])
     df1_pivot = df1_pivot[date_cols+fixed]
 
     # 4) Merge side-by-side on label & section (as requested)
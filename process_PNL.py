@@ -7,46 +7,112 @@ import html
 from typing import Any, Dict, List, Optional
 import argparse
 import pandas as pd
-from xerosummary_pnl import get_bank_summary_json
+from xerosummary_pnl import get_bank_summary_json, get_bank_summary_json_many, MAX_PERIODS
+import reportstore
 from datetime import datetime
 
 
 def load_pl_json(ondate: datetime, todate: datetime, period: int | None = None, timeframe: str | None = None) -> Dict[str, Any]:
-    if period and timeframe:
-        return get_bank_summary_json(ondate, todate, period, timeframe)
-    elif period:
-        return get_bank_summary_json(ondate, todate, period)
-    elif timeframe:
-        return get_bank_summary_json(ondate, todate, timeframe)
-    return get_bank_summary_json(ondate, todate)
+    # Xero wants YYYY-MM-DD (str(datetime) would also send "00:00:00")
+    ondate, todate = ondate.strftime("%Y-%m-%d"), todate.strftime("%Y-%m-%d")
+    params = {"fromDate": ondate, "toDate": todate, "periods": period, "timeframe": timeframe}
+
+    # every column of the report ends on or before toDate, so it is final once toDate is locked
+    return reportstore.get_or_fetch(
+        "ProfitAndLoss", params, todate,
+        lambda: get_bank_summary_json(ondate, todate, period, timeframe),
+    )
+
+
+def load_pl_windows(windows: List[tuple]) -> List[Dict[str, Any]]:
+    # windows: (fromdate, todate[, periods[, timeframe]]) as datetimes; open ones fetched
+    # concurrently (xeroasync), locked ones served from report_store
+    items = []
+    for w in windows:
+        periods = w[2] if len(w) > 2 else None
+        timeframe = w[3] if len(w) > 3 else None
+        f, t = w[0].strftime("%Y-%m-%d"), w[1].strftime("%Y-%m-%d")
+        items.append(({"fromDate": f, "toDate": t, "periods": periods, "timeframe": timeframe}, t))
+
+    return reportstore.get_or_fetch_many(
+        "ProfitAndLoss", items,
+        lambda params: get_bank_summary_json_many(
+            [(p["fromDate"], p["toDate"], p["periods"], p["timeframe"]) for p in params]),
+    )
+
+#------------------------------------------------------------------------------------------Windows beyond 11 periods
+
+# Months moved per timeframe unit
+TIMEFRAME_MONTHS = {"MONTH": 1, "QUARTER": 3, "YEAR": 12}
+PNL_KEY_COLS = ["Section", "Label", "Period", "IsSummary", "AccountId"]
+
+
+def _shift_months(d: datetime, months: int) -> datetime:
+    # month-ends stay month-ends (31 Jan -> 28/29 Feb), other days are clamped
+    shifted = pd.Timestamp(d) + pd.DateOffset(months=months)
+    if pd.Timestamp(d).is_month_end:
+        shifted = shifted + pd.offsets.MonthEnd(0)
+    return shifted.to_pydatetime()
+
+
+def pnl_windows(ondate: datetime, todate: datetime, period: int | None = None,
+                timeframe: str | None = None) -> List[tuple]:
+    """
+    Xero returns the from/to period plus `periods` comparatives, each one timeframe further back,
+    and accepts at most 11 comparatives. Longer ranges become consecutive windows of up to
+    12 columns: window k starts 12*k timeframe units before the requested period.
+    """
+    if not period or period <= MAX_PERIODS:
+        return [(ondate, todate, period, timeframe)]
+
+    step = TIMEFRAME_MONTHS[timeframe or "MONTH"] * (MAX_PERIODS + 1)
+    columns = period + 1
+    windows = []
+    k = 0
+    while columns > 0:
+        cols = min(columns, MAX_PERIODS + 1)
+        windows.append((
+            _shift_months(ondate, -step * k),
+            _shift_months(todate, -step * k),
+            cols - 1 or None,          # a lone trailing column needs no periods parameter
+            timeframe if cols > 1 else None,
+        ))
+        columns -= cols
+        k += 1
+    return windows
+
+
+def load_pl_rows(ondate: datetime, todate: datetime, period: int | None = None,
+                 timeframe: str | None = None) -> List[Dict[str, Any]]:
+    """
+    Flattened PnL rows for any number of periods. Windows are fetched together
+    (load_pl_windows: async client + report store), flattened and merged; a column that two
+    windows both return is kept once, from the newer window.
+    """
+    windows = pnl_windows(ondate, todate, period, timeframe)
+    # one window still goes through the dedup below, so both paths emit the same key set
+    reports = [load_pl_json(*windows[0])] if len(windows) == 1 else load_pl_windows(windows)
+
+    rows: List[Dict[str, Any]] = []
+    seen = set()
+    for report in reports:
+        for r in flatten_pl(report):
+            key = tuple(r.get(c) for c in PNL_KEY_COLS)
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append(r)
+    return rows
 
 #------------------------------------------------------------------------------------------Processing PnL--------
 
-def _currency_to_float(v: Optional[str]) -> Optional[float]:
-    if v is None:
-        return None
-    s = str(v).strip()
-    neg = False
-    if s.startswith("(") and s.endswith(")"):
-        neg = True
-        s = s[1:-1]
-    s = s.replace(",", "")
-    for sym in ("$", "£", "€"):
-        s = s.replace(sym, "")
-    try:
-        num = float(s)
-        return -num if neg else num
-    except ValueError:
-        return None
-
-
 def flatten_pl(report: Dict[str, Any], include_summaries: bool = True) -> List[Dict[str, Any]]:
     """
     Returns a list of dicts with keys:
       - Section (str)
       - Label (str)
       - Period (str)   # from Header row, e.g. "31 Jan 25"
-      - Amount (float or None)
+      - Amount (raw cell text; transform_pnl converts the column with money.to_cents)
       - IsSummary (bool)
       - AccountId (optional str)
     """
@@ -91,7 +157,7 @@ def flatten_pl(report: Dict[str, Any], include_summaries: bool = True) -> List[D
                     # amounts from index 1 onward
                     for i, cell in enumerate(cells[1:], start=1):
                         period = periods[i - 1] if i - 1 < len(periods) else f"col_{i}"
-                        amount = _currency_to_float(cell.get("Value"))
+                        amount = cell.get("Value")
                         row = {
                             "Section": section or "",
                             "Label": label,
@@ -112,7 +178,7 @@ def flatten_pl(report: Dict[str, Any], include_summaries: bool = True) -> List[D
                     label = html.unescape(str(cells[0].get("Value", "")).strip())
                     for i, cell in enumerate(cells[1:], start=1):
                         period = periods[i - 1] if i - 1 < len(periods) else f"col_{i}"
-                        amount = _currency_to_float(cell.get("Value"))
+                        amount = cell.get("Value")
                         out.append({
                             "Section": section or "",
                             "Label": label,
@@ -4,7 +4,8 @@
 import json
 import html
 from typing import Any, Dict, List, Optional, Union
-from xerosummary_TB import get_bank_summary_json
+from xerosummary_TB import get_bank_summary_json, get_bank_summary_json_many
+import reportstore
 import pandas as pd
 from datetime import datetime
 import argparse
@@ -25,34 +26,22 @@ def build_parser() -> argparse.ArgumentParser:
 
 
 def load_tb_for_date(ondate: datetime) -> Dict[str, Any]:
-    return get_bank_summary_json(ondate)
+    # Xero wants YYYY-MM-DD (str(datetime) would also send "00:00:00")
+    d = ondate.strftime("%Y-%m-%d")
+    # dates on or before the lock date come from report_store, no API call
+    return reportstore.get_or_fetch("TrialBalance", {"date": d}, d, lambda: get_bank_summary_json(d))
 
 
-#-------------------------------------------------------------------------------------------MAIN PROCESSING STARTS HERE...
-
-def _currency_to_float(v: Optional[str]) -> Optional[float]:
-
-    if v is None:
-        return None
-    s = str(v).strip()
-    if s == "":
-        return None
-
-    neg = False
-    if s.startswith("(") and s.endswith(")"):
-        neg = True
-        s = s[1:-1]
+def load_tb_for_dates(dates: List[datetime]) -> List[Dict[str, Any]]:
+    # open dates fetched concurrently (xeroasync), closed ones from report_store; order kept
+    ds = [d.strftime("%Y-%m-%d") for d in dates]
+    return reportstore.get_or_fetch_many(
+        "TrialBalance", [({"date": d}, d) for d in ds],
+        lambda params: get_bank_summary_json_many([p["date"] for p in params]),
+    )
 
-    s = s.replace(",", "")
-    for sym in ("$", "£", "€"):
-        s = s.replace(sym, "")
-
-    try:
-        num = float(s)
-        return -num if neg else num
-    except ValueError:
-        return None
 
+#-------------------------------------------------------------------------------------------MAIN PROCESSING STARTS HERE...
 
 def _base_report(report: Dict[str, Any]) -> Dict[str, Any]:
 
@@ -87,10 +76,11 @@ def flatten_trial_balance(report: Dict[str, Any]) -> List[Dict[str, Any]]:
                             account_id = a.get("Value")
                             break
 
-                debit = _currency_to_float(cells[1].get("Value") if len(cells) >= 2 else None)
-                credit = _currency_to_float(cells[2].get("Value") if len(cells) >= 3 else None)
-                ytd_debit = _currency_to_float(cells[3].get("Value") if len(cells) >= 4 else None)
-                ytd_credit = _currency_to_float(cells[4].get("Value") if len(cells) >= 5 else None)
+                # raw cell text; transform_tb turns whole columns into cents (money.to_cents)
+                debit = cells[1].get("Value") if len(cells) >= 2 else None
+                credit = cells[2].get("Value") if len(cells) >= 3 else None
+                ytd_debit = cells[3].get("Value") if len(cells) >= 4 else None
+                ytd_credit = cells[4].get("Value") if len(cells) >= 5 else None
 
                 out.append({
                     "Section": section or "",
@@ -6,6 +6,7 @@ import re
 import csv
 from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
+from xerodates import xero_dates
 from xerosummary_accounts import get_bank_summary_json
 import pandas as pd
 
@@ -14,24 +15,11 @@ import pandas as pd
 # ------------------------------------------------------------
 
 
-def load_accounts() -> Dict[str, Any]:
-    return get_bank_summary_json()
+def load_accounts(modified_since: str | None = None) -> Dict[str, Any]:
+    return get_bank_summary_json(modified_since=modified_since)
 
 
 
-def parse_xero_date(d: Optional[str]) -> Optional[str]:
-    """
-    Convert Xero /Date(1769528067125+0000)/ into YYYY-MM-DD.
-    """
-    if not d or not isinstance(d, str):
-        return None
-    m = re.search(r"/Date\((\d+)", d)
-    if not m:
-        return None
-    ts_ms = int(m.group(1))
-    from datetime import datetime, timezone
-    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
-
 
 def flatten_accounts(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     accounts = data.get("Accounts", []) or []
@@ -55,7 +43,7 @@ def flatten_accounts(data: Dict[str, Any]) -> List[Dict[str, Any]]:
             "HasAttachments": acc.get("HasAttachments"),
             "AddToWatchlist": acc.get("AddToWatchlist"),
             "UpdatedDateUTC_raw": acc.get("UpdatedDateUTC"),
-            "UpdatedDateUTC": parse_xero_date(acc.get("UpdatedDateUTC")),
+            "UpdatedDateUTC": acc.get("UpdatedDateUTC"),  # converted in bulk by accounts_df
         }
 
         # Add any additional unmapped fields
@@ -90,15 +78,18 @@ def accounts_df(rows: List[Dict[str, Any]]) -> pd.DataFrame:
 
     # Build DataFrame with consistent columns
     df = pd.DataFrame(rows, columns=cols)
+    df["UpdatedDateUTC"] = xero_dates(df["UpdatedDateUTC"])
 
     return df
 
 
-def trigger_accounts() -> pd.DataFrame:
+def trigger_accounts(modified_since: str | None = None) -> pd.DataFrame:
 
-    report = load_accounts()
+    report = load_accounts(modified_since)
     rows = flatten_accounts(report)
     df = accounts_df(rows)
+    if df.empty:
+        return df
     df.drop_duplicates(subset=["AccountID"],inplace=True)
 
     return df
\ No newline at end of file
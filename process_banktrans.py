@@ -2,10 +2,17 @@
 # -*- coding: utf-8 -*-
 
 import json
+import os
 import re
 import csv
 from dataclasses import dataclass
+from datetime import date, timedelta
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, List, Optional
+from xerodates import xero_dates, xero_datetimes_iso
+from xerosummary_bank import iter_bank_summary_pages
+import pandas as pd
 
 # Config model and defaults
 @dataclass
@@ -19,17 +26,31 @@ CONFIG = Config(
     output_path="banktrans.csv",
 )
 
+# Date range is cut into windows of this many days; each window pages on its own
+BANK_WINDOW_DAYS = int(os.environ.get("BANK_WINDOW_DAYS", "31"))
+# Windows fetched side by side (xeroratelimit still caps the calls per tenant)
+BANK_WINDOW_CONCURRENCY = int(os.environ.get("BANK_WINDOW_CONCURRENCY", "3"))
 
-def parse_xero_date(d: Optional[str]) -> Optional[str]:
+# Stable header order – includes everything in the provided JSON + derived
+BANK_COLS = [
+    # Identity / categorization
+    "BankTransactionID", "Type", "Direction", "IsTransfer", "Reference",
+    "Status", "IsReconciled", "HasAttachments",
+
+    # Amounts / currency
+    "LineAmountTypes", "SubTotal", "TotalTax", "Total",
+    "CurrencyCode", "CurrencyRate",
+
+    # Dates
+    "Date", "DateString", "UpdatedDate", "UpdatedDateUTC", "UpdatedDateUTC_raw",
+
+    # Bank account
+    "BankAccountID", "BankAccountCode", "BankAccountName",
+
+    # Contact
+    "ContactID", "ContactName",
+]
 
-    if not d or not isinstance(d, str):
-        return None
-    m = re.search(r"/Date\((\d+)", d)
-    if not m:
-        return None
-    ts_ms = int(m.group(1))
-    from datetime import datetime, timezone
-    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
 
 
 def load_json(path: str) -> Dict[str, Any]:
@@ -84,9 +105,7 @@ def flatten_bank_transactions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
         total = t.get("Total")
         currency_code = t.get("CurrencyCode")
         date_str = t.get("DateString")
-        date_clean = parse_xero_date(t.get("Date"))
         updated_utc_raw = t.get("UpdatedDateUTC")
-        updated_date_clean = parse_xero_date(updated_utc_raw)
 
         # BankAccount
         ba = t.get("BankAccount") or {}
@@ -122,10 +141,11 @@ def flatten_bank_transactions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
             "CurrencyCode": currency_code,
             "CurrencyRate": currency_rate,
 
-            # Dates
-            "Date": date_clean,
+            # Dates: raw /Date(ms)/ values, bank_transactions_df converts the columns in bulk
+            "Date": t.get("Date"),
             "DateString": date_str,
-            "UpdatedDate": updated_date_clean,
+            "UpdatedDate": updated_utc_raw,
+            "UpdatedDateUTC": updated_utc_raw,
             "UpdatedDateUTC_raw": updated_utc_raw,
 
             # Bank account
@@ -141,43 +161,75 @@ def flatten_bank_transactions(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     return out
 
 
-def export_csv(rows: List[Dict[str, Any]], csv_path: str):
-    if not rows:
+def export_csv(df: pd.DataFrame, csv_path: str):
+    if df.empty:
         print("No rows to export.")
         return
 
-    # Stable header order – includes everything in the provided JSON + derived
-    cols = [
-        # Identity / categorization
-        "BankTransactionID", "Type", "Direction", "IsTransfer", "Reference",
-        "Status", "IsReconciled", "HasAttachments",
+    df.to_csv(csv_path, index=False, encoding="utf-8")
 
-        # Amounts / currency
-        "LineAmountTypes", "SubTotal", "TotalTax", "Total",
-        "CurrencyCode", "CurrencyRate",
 
-        # Dates
-        "Date", "DateString", "UpdatedDate", "UpdatedDateUTC_raw",
+# ------------------------------------------------------------
+# Sharded fetch for the database loader
+# ------------------------------------------------------------
+def bank_windows(start_date: str, end_date: str, days: int = BANK_WINDOW_DAYS) -> List[tuple]:
+    """Non-overlapping (start, end) windows covering start..end; both ends inclusive like Xero's Date filter."""
+    start, end = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    out = []
+    while start <= end:
+        stop = min(start + timedelta(days=max(1, days) - 1), end)
+        out.append((start.isoformat(), stop.isoformat()))
+        start = stop + timedelta(days=1)
+    return out
 
-        # Bank account
-        "BankAccountID", "BankAccountCode", "BankAccountName",
 
-        # Contact
-        "ContactID", "ContactName",
-    ]
-
-    with open(csv_path, "w", encoding="utf-8", newline="") as f:
-        writer = csv.DictWriter(f, fieldnames=cols)
-        writer.writeheader()
-        for r in rows:
-            writer.writerow(r)
+def bank_transactions_df(rows: List[Dict[str, Any]]) -> pd.DataFrame:
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows, columns=BANK_COLS)
+
+    # vectorised /Date(ms)/ -> ISO, one pass per column; missing dates stay NULL here
+    df["Date"] = xero_dates(df["Date"], missing=None)
+    df["UpdatedDate"] = xero_dates(df["UpdatedDate"], missing=None)
+    df["UpdatedDateUTC"] = xero_datetimes_iso(df["UpdatedDateUTC"])
+    return df
+
+
+def _fetch_window(window: tuple) -> pd.DataFrame:
+    rows: List[Dict[str, Any]] = []
+    for page in iter_bank_summary_pages(*window):
+        rows.extend(flatten_bank_transactions(page))
+    df = bank_transactions_df(rows)
+    print(f"[banktrans] {window[0]}..{window[1]}: {len(df)} transactions")
+    return df
+
+
+def iter_bank_frames(start_date: str, end_date: str, days: int = BANK_WINDOW_DAYS,
+                     concurrency: int = BANK_WINDOW_CONCURRENCY):
+    """
+    One DataFrame per date window. Up to `concurrency` windows are in flight at once and a new
+    one starts only when a finished one is handed over, so memory is bounded by the windows in
+    flight, not the whole range. Frames come out in completion order.
+    """
+    windows = iter(bank_windows(start_date, end_date, days))
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="xero-bank") as pool:
+        inflight = {pool.submit(_fetch_window, w) for w in islice(windows, max(1, concurrency))}
+        while inflight:
+            done, inflight = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in done:
+                df = fut.result()
+                nxt = next(windows, None)
+                if nxt is not None:
+                    inflight.add(pool.submit(_fetch_window, nxt))
+                if not df.empty:
+                    yield df
 
 
 def run(config: Config = CONFIG) -> int:
 
     data = load_json(config.input_path)
     rows = flatten_bank_transactions(data)
-    export_csv(rows, config.output_path)
+    export_csv(bank_transactions_df(rows), config.output_path)
     print(f"Exported {len(rows)} rows → {config.output_path}")
     return len(rows)
 
@@ -6,33 +6,15 @@ import re
 import csv
 from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
-from datetime import datetime, timezone
-from xerosummary_journals import runjournal
+from xerodates import xero_dates, xero_datetimes_iso
+from xerosummary_journals import runjournal, iter_journal_pages
 import pandas as pd
 
 
-def load_journal() -> Dict[str, Any]:
-    return runjournal()
+def load_journal(offset: int = 0) -> Dict[str, Any]:
+    return runjournal(offset)
 
 
-def parse_xero_date(d: Optional[str]) -> Optional[str]:
-    if not d or not isinstance(d, str):
-        return None
-    m = re.search(r"/Date\((\d+)", d)
-    if not m:
-        return None
-    ts_ms = int(m.group(1))
-    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
-
-def parse_xero_datetime_iso(d: Optional[str]) -> Optional[str]:
-    if not d or not isinstance(d, str):
-        return None
-    m = re.search(r"/Date\((\d+)", d)
-    if not m:
-        return None
-    ts_ms = int(m.group(1))
-    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-
 def load_json(path: str) -> Dict[str, Any]:
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
@@ -63,10 +45,11 @@ def flatten_journals(payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 
         base_ctx["JournalID"] = j.get("JournalID")
         base_ctx["JournalNumber"] = j.get("JournalNumber")
+        # raw /Date(ms)/ values; journalsdf converts the whole column at once
         base_ctx["JournalDate_raw"] = j.get("JournalDate")
-        base_ctx["JournalDate"] = parse_xero_date(j.get("JournalDate"))
+        base_ctx["JournalDate"] = j.get("JournalDate")
         base_ctx["CreatedDateUTC_raw"] = j.get("CreatedDateUTC")
-        base_ctx["CreatedDateUTC"] = parse_xero_datetime_iso(j.get("CreatedDateUTC"))
+        base_ctx["CreatedDateUTC"] = j.get("CreatedDateUTC")
         base_ctx["Reference"] = j.get("Reference")
         base_ctx["SourceID"] = j.get("SourceID")
         base_ctx["SourceType"] = j.get("SourceType")
@@ -89,13 +72,7 @@ def flatten_journals(payload: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
             row["TaxType"] = line.get("TaxType")
             row["TaxName"] = line.get("TaxName")
 
-            # Debit/Credit logic
-            try:
-                amt = float(line.get("NetAmount") or 0.0)
-            except Exception:
-                amt = 0.0
-            row["Debit"] = amt if amt > 0 else 0.0
-            row["Credit"] = -amt if amt < 0 else 0.0
+            # Debit/Credit are split from NetAmount per column in journalsdf
 
             # === Tracking Categories Expanded ===
             tc_list = line.get("TrackingCategories") or []
@@ -138,16 +115,40 @@ def journalsdf (rows: List[Dict[str, Any]]) -> pd.DataFrame:
         "TrackingCategory2_TrackingOptionID"
     ]
 
-    all_cols = ensure_all_keys(rows)
+    df = pd.DataFrame(rows)
+
+    # Debit/Credit logic, one pass over NetAmount (blank or unparsable counts as 0)
+    amt = pd.to_numeric(df["NetAmount"], errors="coerce").fillna(0.0).astype("float64")
+    df["Debit"] = amt.where(amt > 0, 0.0)
+    df["Credit"] = (-amt).where(amt < 0, 0.0)
+
+    all_cols = ensure_all_keys(rows) + ["Debit", "Credit"]
     ordered_cols = [c for c in base_cols if c in all_cols]
-    df = pd.DataFrame(rows)[ordered_cols]
+    df = df[ordered_cols]
+
+    # vectorised /Date(ms)/ -> ISO, one pass per column
+    if "JournalDate" in df.columns:
+        df["JournalDate"] = xero_dates(df["JournalDate"])
+    if "CreatedDateUTC" in df.columns:
+        df["CreatedDateUTC"] = xero_datetimes_iso(df["CreatedDateUTC"])
     return df
 
-def trigger_journal() -> pd.DataFrame:
+def trigger_journal(offset: int = 0) -> pd.DataFrame:
 
-    report = load_journal()
+    report = load_journal(offset)
     rows = flatten_journals(report)
     df = journalsdf(rows)
     df.drop_duplicates(inplace=True)
 
-    return df
\ No newline at end of file
+    return df
+
+
+def iter_journal_frames(offset: int = 0):
+    # One DataFrame per API page (100 journals), so callers never hold the full ledger
+    for page in iter_journal_pages(offset):
+        rows = flatten_journals(page)
+        df = journalsdf(rows)
+        if df.empty:
+            continue
+        df.drop_duplicates(inplace=True)
+        yield df
\ No newline at end of file
@@ -6,28 +6,16 @@ import re
 import csv
 from dataclasses import dataclass
 from typing import Dict, Any, List, Optional
-from xerosummary_manualjournals import get_bank_summary_json
+from xerodates import xero_dates
+from xerosummary_manualjournals import get_bank_summary_json, iter_bank_summary_pages
 import pandas as pd
 
-def load_journal() -> Dict[str, Any]:
-    return get_bank_summary_json()
+def load_journal(modified_since: str | None = None) -> Dict[str, Any]:
+    return get_bank_summary_json(modified_since=modified_since)
 
 # ------------------------------------------------------------
 # Helpers
 # ------------------------------------------------------------
-def parse_xero_date(d: Optional[str]) -> Optional[str]:
-    """
-    Convert Xero /Date(1769528067125+0000)/ into YYYY-MM-DD.
-    Supports both /Date(1234567890)/ and /Date(1234567890+0000)/.
-    """
-    if not d or not isinstance(d, str):
-        return None
-    m = re.search(r"/Date\((\d+)", d)
-    if not m:
-        return None
-    ts_ms = int(m.group(1))
-    from datetime import datetime, timezone
-    return datetime.fromtimestamp(ts_ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d")
 
 # ------------------------------------------------------------
 # Core Flattening Logic
@@ -35,7 +23,8 @@ def parse_xero_date(d: Optional[str]) -> Optional[str]:
 def flatten_manual_journals(data: Dict[str, Any]) -> List[Dict[str, Any]]:
     """
     Flattens the 'ManualJournals' array into rows for CSV.
-    Each manual journal becomes one row (journal lines are summarized as count + JSON).
+    Each manual journal becomes one row; its parsed JournalLines list rides along as-is
+    for manual_journal_lines_df (no JSON round trip).
     """
     mjs = data.get("ManualJournals", []) or []
     out: List[Dict[str, Any]] = []
@@ -50,14 +39,15 @@ def flatten_manual_journals(data: Dict[str, Any]) -> List[Dict[str, Any]]:
             "ShowOnCashBasisReports": mj.get("ShowOnCashBasisReports"),
             "HasAttachments": mj.get("HasAttachments"),
 
+            # raw /Date(ms)/ values; manual_journals_df converts the columns in bulk
             "Date_raw": mj.get("Date"),
-            "Date": parse_xero_date(mj.get("Date")),
+            "Date": mj.get("Date"),
             "UpdatedDateUTC_raw": mj.get("UpdatedDateUTC"),
-            "UpdatedDateUTC": parse_xero_date(mj.get("UpdatedDateUTC")),
+            "UpdatedDateUTC": mj.get("UpdatedDateUTC"),
 
             # Journal lines summary
             "JournalLinesCount": len(lines),
-            "JournalLinesJSON": json.dumps(lines, ensure_ascii=False),
+            "JournalLines": lines,
         }
 
         # Auto-include any additional unmapped fields for future-proofing
@@ -90,7 +80,7 @@ def manual_journals_df(rows: List[Dict[str, Any]]) -> pd.DataFrame:
         "UpdatedDateUTC",
         "UpdatedDateUTC_raw",
         "JournalLinesCount",
-        "JournalLinesJSON",
+        "JournalLines",
     ]
 
     # Auto-append any extra keys found in data
@@ -101,19 +91,81 @@ def manual_journals_df(rows: List[Dict[str, Any]]) -> pd.DataFrame:
 
     # Build DataFrame with consistent column order
     df = pd.DataFrame(rows, columns=cols)
+    df["Date"] = xero_dates(df["Date"])
+    df["UpdatedDateUTC"] = xero_dates(df["UpdatedDateUTC"])
 
     return df
 
+LINE_COLS = [
+    "ManualJournalID",
+    "LineIndex",
+    "Description",
+    "LineAmount",
+    "AccountID",
+    "AccountCode",
+    "TaxType",
+    "TaxAmount",
+    "IsBlank",
+    "TrackingCount",
+    "Tracking1_Name",
+    "Tracking1_Option",
+    "Tracking2_Name",
+    "Tracking2_Option",
+]
+
+
+def manual_journal_lines_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per journal line, built in bulk from the JournalLines lists carried by the
+    header frame. LineIndex is the 0-based position of the line inside its journal.
+    """
+    if df.empty or "JournalLines" not in df.columns:
+        return pd.DataFrame(columns=LINE_COLS)
+
+    s = df.set_index("ManualJournalID")["JournalLines"].explode().dropna()
+    if s.empty:
+        return pd.DataFrame(columns=LINE_COLS)
+
+    lines = pd.DataFrame.from_records(s.tolist())
+    lines.insert(0, "ManualJournalID", s.index.to_numpy())
+    lines.insert(1, "LineIndex", s.groupby(level=0).cumcount().to_numpy())
+
+    # Tracking is a list per line; keep the first two like journals do
+    tracking = lines.pop("Tracking") if "Tracking" in lines.columns else [None] * len(lines)
+    tracking = [t if isinstance(t, list) else [] for t in tracking]
+    lines["TrackingCount"] = [len(t) for t in tracking]
+    for i in (1, 2):
+        lines[f"Tracking{i}_Name"] = [t[i - 1].get("Name") if len(t) >= i else None for t in tracking]
+        lines[f"Tracking{i}_Option"] = [t[i - 1].get("Option") if len(t) >= i else None for t in tracking]
+
+    return lines.reindex(columns=LINE_COLS)
+
 # ------------------------------------------------------------
 # Trigger point
 # ------------------------------------------------------------
 
-def trigger_manualjournal() -> pd.DataFrame:
+def trigger_manualjournal(modified_since: str | None = None) -> pd.DataFrame:
 
-    report = load_journal()
-    rows = flatten_manual_journals(report)
+    # Flatten page by page so only one raw payload is held at a time
+    rows: List[Dict[str, Any]] = []
+    for page in iter_bank_summary_pages(modified_since):
+        rows.extend(flatten_manual_journals(page))
     df = manual_journals_df(rows)
+    if df.empty:
+        return df
     df.drop_duplicates(subset=["ManualJournalID"],inplace=True)
     #print(df)
 
-    return df
\ No newline at end of file
+    return df
+
+
+def iter_manualjournal_frames(modified_since: str | None = None):
+    # One DataFrame per API page (100 journals, their JournalLines attached), so callers
+    # never hold the whole tenant
+    for page in iter_bank_summary_pages(modified_since):
+        rows = flatten_manual_journals(page)
+        if not rows:
+            continue
+        df = manual_journals_df(rows)
+        df.drop_duplicates(subset=["ManualJournalID"], inplace=True)
+        yield df
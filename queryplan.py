@@ -0,0 +1,108 @@
+import sys
+from sqlalchemy import text, bindparam
+from db_config import engine
+from bootstrap import ensure_schema
+from insertions import (
+    build_upsert, EXISTING_VALUES_SQL, HIGH_WATER_SQL, DELETE_STALE_MJ_LINES,
+    TB_COLS, PNL_COLS, JOURNAL_COLS, MANUALJOURNAL_COLS, MANUALJOURNAL_LINE_COLS, ACCOUNT_COLS, BANKTRANS_COLS,
+)
+import shielded_expense
+
+# EXPLAIN QUERY PLAN regression check for the queries that run on every sync.
+#
+#   python queryplan.py      prints every plan; exits 1 if a query scans a table instead of
+#                            searching an index (e.g. after an index was dropped or a WHERE
+#                            clause stopped being sargable)
+#
+# Runs against the configured database (db_config), after ensure_schema, so plans reflect the
+# real index set. journal_temp is read end to end by design and is the only allowed scan.
+
+ALLOWED_SCANS = {"t"}  # journal_temp AS t in the shielded_expense insert/update
+
+# table -> (key, fingerprint) as the loaders call upsert_rows
+UPSERTS = {
+    "tb_client": (TB_COLS, "row_hash", None),
+    "pnl_client": (PNL_COLS, "row_hash", None),
+    "journalsraw": (JOURNAL_COLS, "journallineid", "row_fingerprint"),
+    "manualjournalsraw": (MANUALJOURNAL_COLS, "manualjournalid", None),
+    "manualjournallinesraw": (MANUALJOURNAL_LINE_COLS, "linekey", None),
+    "accountsraw": (ACCOUNT_COLS, "accountid", None),
+    "banktransactionsraw": (BANKTRANS_COLS, "banktransactionid", None),
+}
+
+TENANT = {"tenant_id": "queryplan"}
+
+
+def checks() -> list[tuple[str, object, dict]]:
+    # the insert/update read journal_temp, so main() creates it after planning its CREATE
+    out = [
+        ("expense: insert new", shielded_expense.SQL_INSERT_NEW, {}),
+        ("expense: update existing", shielded_expense.SQL_UPDATE_EXISTING, {}),
+        ("expense: sheet select", shielded_expense.SQL_SELECT_PROCESSED, TENANT),
+        ("journals: high-water mark", HIGH_WATER_SQL, TENANT),
+        ("manualjournal lines: stale tail", DELETE_STALE_MJ_LINES, {"manualjournalid": "x", "n": 0}),
+    ]
+    for table, (cols, key, fingerprint) in UPSERTS.items():
+        row = {c: None for c in cols}
+        out.append((f"upsert {table}", build_upsert(table, cols, key, fingerprint), row))
+        for col in filter(None, (key, fingerprint)):
+            stmt = text(EXISTING_VALUES_SQL.format(col=col, table=table))
+            out.append((f"existing {table}.{col}", stmt, {"vals": ["a", "b"]}))
+    return out
+
+
+def explain(conn, stmt, params: dict) -> list[str]:
+    query = text(f"EXPLAIN QUERY PLAN {stmt.text}")
+    # list values are IN :vals lists, as in insertions._existing_values
+    expanding = [bindparam(k, expanding=True) for k, v in params.items() if isinstance(v, list)]
+    if expanding:
+        query = query.bindparams(*expanding)
+    return [r[3] for r in conn.execute(query, params)]
+
+
+def table_scans(plan: list[str]) -> list[str]:
+    # "SCAN j1" is a full table scan; "SCAN j1 USING [COVERING] INDEX ..." walks a whole index, just as bad.
+    # Aggregates over an unindexed filter show up as a bare "SEARCH journalsraw" (no USING) - also a scan.
+    bad = []
+    for step in plan:
+        bare_search = step.startswith("SEARCH ") and " USING " not in step
+        if not (step.startswith("SCAN ") or bare_search):
+            continue
+        name = step.split()[1]
+        if name in ALLOWED_SCANS or name == "CONSTANT":
+            continue
+        bad.append(step)
+    return bad
+
+
+def check(conn, name: str, stmt, params: dict) -> bool:
+    plan = explain(conn, stmt, params)
+    bad = table_scans(plan)
+    print(f"{'SCAN' if bad else 'ok':4s}  {name}")
+    for step in plan:
+        print(f"        {step}")
+    return not bad
+
+
+def main() -> int:
+    if engine.dialect.name != "sqlite":
+        # EXPLAIN QUERY PLAN output is SQLite's; on Postgres use EXPLAIN directly
+        print(f"queryplan checks SQLite plans only (DATABASE_URL is {engine.dialect.name})")
+        return 0
+    ensure_schema()
+    failed = 0
+    with engine.connect() as conn:
+        conn.execute(shielded_expense.SQL_DROP_TEMP)
+        failed += not check(conn, "expense: build journal_temp", shielded_expense.SQL_CREATE_TEMP, TENANT)
+
+        # an empty journal_temp so the insert/update from it can be planned
+        conn.execute(text("CREATE TEMP TABLE journal_temp AS SELECT * FROM journal_processed WHERE 0"))
+        for name, stmt, params in checks():
+            failed += not check(conn, name, stmt, params)
+        conn.execute(shielded_expense.SQL_DROP_TEMP)
+    print(f"{failed} quer{'y' if failed == 1 else 'ies'} fall back to a table scan" if failed else "all queries use an index")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
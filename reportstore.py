@@ -0,0 +1,114 @@
+import json
+import threading
+from datetime import datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from db_config import engine, SessionLocal
+from xerotokens import get_tenant_id
+from xerosummary_organisation import get_lock_date
+import xerocache
+
+# Closed-period report store.
+#
+# A TB at, or a PnL ending on, a date no later than the organisation lock date cannot change any
+# more (EndOfYearLockDate by default; see xerosummary_organisation.LOCK_DATE_FIELD), so the raw payload is kept in report_store and served from there on later runs with
+# no API call. Only open periods go to Xero.
+#
+# Finality is checked against the lock date read at the start of each run (one Organisation
+# call), not the one stored with the payload: if someone moves the lock date back, those
+# periods are open again and get refetched.
+
+_lock = threading.Lock()
+_lock_date: dict = {}  # tenant_id -> lock date
+
+
+def current_lock_date() -> str | None:
+    tenant_id = get_tenant_id()
+    with _lock:
+        if tenant_id not in _lock_date:
+            try:
+                _lock_date[tenant_id] = get_lock_date()
+            except xerocache.CacheMiss:
+                # replay run without a recorded Organisation call: treat everything as open
+                _lock_date[tenant_id] = None
+        return _lock_date[tenant_id]
+
+
+def is_closed(period_end: str) -> bool:
+    lock = current_lock_date()
+    return bool(lock) and period_end <= lock
+
+
+def params_key(params: dict) -> str:
+    return json.dumps({k: str(v) for k, v in sorted(params.items()) if v is not None}, sort_keys=True)
+
+
+def lookup(report: str, params: dict, period_end: str) -> dict | None:
+    if not is_closed(period_end):
+        return None
+    with engine.connect() as conn:
+        payload = conn.execute(
+            text("""SELECT payload FROM report_store
+                    WHERE tenant_id = :tenant_id AND report = :report AND params_key = :params_key"""),
+            {"tenant_id": get_tenant_id(), "report": report, "params_key": params_key(params)},
+        ).scalar()
+    return json.loads(payload) if payload is not None else None
+
+
+def save(report: str, params: dict, period_end: str, payload: dict) -> bool:
+    # open periods are never stored; they would only be refetched anyway
+    if not payload or not is_closed(period_end):
+        return False
+    with SessionLocal.begin() as session:
+        try:
+            session.execute(text("""
+                INSERT INTO report_store (tenant_id, report, params_key, period_end, lock_date, fetched_utc, payload)
+                VALUES (:tenant_id, :report, :params_key, :period_end, :lock_date, :fetched_utc, :payload)
+                ON CONFLICT (tenant_id, report, params_key) DO UPDATE SET
+                    period_end  = excluded.period_end,
+                    lock_date   = excluded.lock_date,
+                    fetched_utc = excluded.fetched_utc,
+                    payload     = excluded.payload
+            """), {
+                "tenant_id": get_tenant_id(),
+                "report": report,
+                "params_key": params_key(params),
+                "period_end": period_end,
+                "lock_date": current_lock_date(),
+                "fetched_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S"),
+                "payload": json.dumps(payload),
+            })
+            session.commit()
+        except SQLAlchemyError:
+            session.rollback()
+            raise
+    return True
+
+
+def get_or_fetch(report: str, params: dict, period_end: str, fetch) -> dict:
+    """Serves a closed-period report from report_store, otherwise fetch() and keep it if closed."""
+    payload = lookup(report, params, period_end)
+    if payload is not None:
+        print(f"[reportstore] {report} {params}: period closed (lock {current_lock_date()}), no API call")
+        return payload
+    payload = fetch()
+    save(report, params, period_end, payload)
+    return payload
+
+
+def get_or_fetch_many(report: str, items: list[tuple[dict, str]], fetch_many) -> list[dict]:
+    """
+    items: (params, period_end) per report. Closed ones come from the store; the rest are
+    handed to fetch_many(list_of_params) in one go (e.g. the async client). Order is kept.
+    """
+    out = [lookup(report, params, period_end) for params, period_end in items]
+    todo = [i for i, payload in enumerate(out) if payload is None]
+    served = len(items) - len(todo)
+    if served:
+        print(f"[reportstore] {report}: {served}/{len(items)} closed periods served locally (lock {current_lock_date()})")
+    if todo:
+        fetched = fetch_many([items[i][0] for i in todo])
+        for i, payload in zip(todo, fetched):
+            save(report, items[i][0], items[i][1], payload)
+            out[i] = payload
+    return out
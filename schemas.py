@@ -1,4 +1,5 @@
 #Performs data validation...
+import re
 
 
 MASTER_DDL = """
@@ -20,25 +21,17 @@ CREATE TABLE IF NOT EXISTS tb_client (
   debit        REAL    NULL,
   credit       REAL    NULL,
   accountid    TEXT    NULL,
-  accountcode  TEXT    NULL
+  accountcode  TEXT    NULL,
+  debit_cents  BIGINT  NULL,
+  credit_cents BIGINT  NULL,
+  accountcode_int BIGINT  NULL,
+  period_year  INTEGER NULL,
+  period_month INTEGER NULL
 );
 
 """
 
 
-TB_STG = """
-CREATE TABLE IF NOT EXISTS tb_client_stg (
-  tenant_id     TEXT    NOT NULL, 
-  row_hash     TEXT    PRIMARY KEY,
-  date         TEXT    NOT NULL,
-  section      TEXT    NOT NULL,
-  label        TEXT    NOT NULL,
-  debit        REAL    NULL,
-  credit       REAL    NULL,
-  accountid    TEXT    NULL,
-  accountcode  TEXT    NULL
-);
-"""
 
 
 #----------------------------------------------------------------------
@@ -54,23 +47,14 @@ CREATE TABLE IF NOT EXISTS pnl_client (
   label      TEXT    NOT NULL,
   amount     REAL    NULL,
   issummary  TEXT    NULL,
-  accountid  TEXT    NULL
+  accountid  TEXT    NULL,
+  amount_cents BIGINT NULL,
+  period_year  INTEGER NULL,
+  period_month INTEGER NULL
 );
 """
 
 
-PNL_STG = """
-CREATE TABLE IF NOT EXISTS pnl_client_stg (
-  tenant_id     TEXT    NOT NULL, 
-  row_hash   TEXT    PRIMARY KEY,
-  date       TEXT    NOT NULL,
-  section    TEXT    NOT NULL,
-  label      TEXT    NOT NULL,
-  amount     REAL    NULL,
-  issummary  TEXT    NULL,
-  accountid  TEXT    NULL
-);
-"""
 
 #-----------------------------------------------------------------------------------------------
 
@@ -106,48 +90,30 @@ CREATE TABLE IF NOT EXISTS journalsraw (
   trackingcategory2_name                   TEXT NULL,
   trackingcategory2_option                 TEXT NULL,
   trackingcategory2_trackingcategoryid     TEXT NULL,
-  trackingcategory2_trackingoptionid       TEXT NULL
-);
+  trackingcategory2_trackingoptionid       TEXT NULL,
 
-"""
-
-JOURNALS_STG = """
-CREATE TABLE IF NOT EXISTS journalsrawstg (
-  tenant_id     TEXT    NOT NULL, 
-  journallineid                TEXT PRIMARY KEY,
-  referencenumber              TEXT,
-  journalid                    TEXT,
-  journaldate                  DATE,
-  accountid                    TEXT,
-  accountcode                  TEXT,
-  accounttype                  TEXT,
-  accountname                  TEXT,
-  description                  TEXT,
-  sourcetype                   TEXT,
-  reference                    TEXT,
-  netamount                    DECIMAL(18, 2),
-  grossamount                  DECIMAL(18, 2),
-  taxamount                    DECIMAL(18, 2),
-  taxtype                      TEXT,
-  taxname                      TEXT,
-  debit                        DECIMAL(18, 2),
-  credit                       DECIMAL(18, 2),
-  createddateutc               TEXT,
-  trackingcategoriescount      INT,
+  row_fingerprint                          TEXT NULL,
 
-  trackingcategory1_name                   TEXT NULL,
-  trackingcategory1_option                 TEXT NULL,
-  trackingcategory1_trackingcategoryid     TEXT NULL,
-  trackingcategory1_trackingoptionid       TEXT NULL,
+  netamount_cents                          BIGINT NULL,
+  grossamount_cents                        BIGINT NULL,
+  taxamount_cents                          BIGINT NULL,
+  debit_cents                              BIGINT NULL,
+  credit_cents                             BIGINT NULL,
 
-  trackingcategory2_name                   TEXT NULL,
-  trackingcategory2_option                 TEXT NULL,
-  trackingcategory2_trackingcategoryid     TEXT NULL,
-  trackingcategory2_trackingoptionid       TEXT NULL
+  accountcode_int                          BIGINT NULL,
+  referencenumber_int                      BIGINT NULL,
+  period_year                              INTEGER NULL,
+  period_month                             INTEGER NULL
 );
 
 """
 
+# Content hash per line (see transform_journal); the loader looks it up to skip unchanged lines
+JOURNALS_FINGERPRINT_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_row_fingerprint ON journalsraw (row_fingerprint);
+"""
+
+
 #---------------------------------------------------------------------------------------------------
 
 MANUALJOURNALS_DDL = """
@@ -165,21 +131,35 @@ CREATE TABLE IF NOT EXISTS manualjournalsraw (
 
 """
 
-MANUALJOURNALS_STG = """
-CREATE TABLE IF NOT EXISTS manualjournalsstg (
-  tenant_id     TEXT    NOT NULL, 
-  manualjournalid           TEXT PRIMARY KEY,
-  status                    TEXT,
+# One row per manual journal line; linekey is "<manualjournalid>:<lineindex>"
+MANUALJOURNAL_LINES_DDL = """
+CREATE TABLE IF NOT EXISTS manualjournallinesraw (
+  tenant_id                 TEXT    NOT NULL,
+  linekey                   TEXT    PRIMARY KEY,
+  manualjournalid           TEXT    NOT NULL,
+  lineindex                 INT     NOT NULL,
   description               TEXT,
-  date                      DATE,
-  updateddateutc            DATE,
-  lineamounttypes           TEXT,
-  showoncashbasisreports    TEXT,
-  hasattachments            TEXT
+  lineamount                DECIMAL(18, 2),
+  accountid                 TEXT,
+  accountcode               TEXT,
+  taxtype                   TEXT,
+  taxamount                 DECIMAL(18, 2),
+  isblank                   TEXT,
+  trackingcount             INT,
+  tracking1_name            TEXT NULL,
+  tracking1_option          TEXT NULL,
+  tracking2_name            TEXT NULL,
+  tracking2_option          TEXT NULL,
+  lineamount_cents          BIGINT NULL,
+  taxamount_cents           BIGINT NULL
 );
+"""
 
+MANUALJOURNAL_LINES_JOURNAL_IDX = """
+CREATE INDEX IF NOT EXISTS ix_manualjournallinesraw_journal ON manualjournallinesraw (manualjournalid, lineindex);
 """
 
+
 #-------------------------------------------------------------------------------------------
 ACCOUNTS_DDL = """
 CREATE TABLE IF NOT EXISTS accountsraw (
@@ -207,29 +187,67 @@ CREATE TABLE IF NOT EXISTS accountsraw (
 );
 """
 
-ACCOUNTS_STG = """
-CREATE TABLE IF NOT EXISTS accountsstg (
+
+#----------------------------------------------------------------------------------------------------------
+BANKTRANSACTIONS_DDL = """
+CREATE TABLE IF NOT EXISTS banktransactionsraw (
   tenant_id                TEXT    NOT NULL,
-  accountid                TEXT    PRIMARY KEY,
-  code                     TEXT,
-  name                     TEXT,
-  status                   TEXT,
+  banktransactionid        TEXT    PRIMARY KEY,
   type                     TEXT,
-  taxtype                  TEXT,
-  class                    TEXT,
-  enablepaymentstoaccount  TEXT,
-  showinexpenseclaims      TEXT,
-  bankaccountnumber        TEXT,
-  bankaccounttype          TEXT,
-  currencycode             TEXT,
-  reportingcode            TEXT,
-  reportingcodename        TEXT,
+  direction                TEXT,
+  istransfer               TEXT,
+  reference                TEXT,
+  status                   TEXT,
+  isreconciled             TEXT,
   hasattachments           TEXT,
-  addtowatchlist           TEXT,
-  updateddateutc           DATE,
-  description              TEXT,
-  reportingname            TEXT,
-  systemaccount            TEXT
+  lineamounttypes          TEXT,
+  subtotal                 DECIMAL(18, 2),
+  totaltax                 DECIMAL(18, 2),
+  total                    DECIMAL(18, 2),
+  currencycode             TEXT,
+  currencyrate             DECIMAL(18, 6),
+  date                     DATE,
+  updateddateutc           TEXT,
+  bankaccountid            TEXT,
+  bankaccountcode          TEXT,
+  bankaccountname          TEXT,
+  contactid                TEXT,
+  contactname              TEXT
+);
+"""
+
+# Reconciliation reads one bank account over a date range
+BANKTRANSACTIONS_ACCOUNT_DATE_IDX = """
+CREATE INDEX IF NOT EXISTS ix_banktransactionsraw_account_date ON banktransactionsraw (tenant_id, bankaccountid, date);
+"""
+
+
+#----------------------------------------------------------------------------------------------------------
+
+# Per tenant/endpoint sync bookkeeping (journal high-water mark etc.)
+SYNC_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS sync_state (
+  tenant_id      TEXT    NOT NULL,
+  endpoint       TEXT    NOT NULL,
+  high_water     INTEGER NULL,
+  last_sync_utc  TEXT    NULL,
+  PRIMARY KEY (tenant_id, endpoint)
+);
+"""
+
+#----------------------------------------------------------------------------------------------------------
+
+# Raw TB / PnL payloads for periods on or before the organisation lock date (reportstore.py)
+REPORT_STORE_DDL = """
+CREATE TABLE IF NOT EXISTS report_store (
+  tenant_id      TEXT    NOT NULL,
+  report         TEXT    NOT NULL,
+  params_key     TEXT    NOT NULL,
+  period_end     TEXT    NOT NULL,
+  lock_date      TEXT    NOT NULL,
+  fetched_utc    TEXT    NOT NULL,
+  payload        TEXT    NOT NULL,
+  PRIMARY KEY (tenant_id, report, params_key)
 );
 """
 
@@ -261,8 +279,158 @@ CREATE TABLE IF NOT EXISTS journal_processed (
   hasattachments            TEXT,
   class                     TEXT,
   reportingcodename         TEXT,
+  debit_cents               BIGINT,
+  credit_cents              BIGINT,
+  grossamount_cents         BIGINT,
+  netamount_cents           BIGINT,
+  accountcode_int           BIGINT,
+  referencenumber_int       BIGINT,
+  period_year               INTEGER,
+  period_month              INTEGER,
   PRIMARY KEY (journallineid)
 );
 """
 
-#--------------------------------------------------------------------------------
\ No newline at end of file
+#----------------------------------------------------------------------------------------------------------
+
+# Money columns that carry an exact integer copy in <column>_cents (money.py). Sums, pivots and
+# GROUP BYs use the cents; the DECIMAL / REAL column is for display. bootstrap.ensure_schema adds
+# the cents columns to older databases and fills them from the stored amounts.
+MONEY_COLUMNS = {
+    "tb_client": ["debit", "credit"],
+    "pnl_client": ["amount"],
+    "journalsraw": ["netamount", "grossamount", "taxamount", "debit", "credit"],
+    "manualjournallinesraw": ["lineamount", "taxamount"],
+    "journal_processed": ["debit", "credit", "grossamount", "netamount"],
+}
+
+# Typed copies of text columns, so filters and sorts compare plain indexed integers instead of
+# CAST() / substr() on every row. Filled by transform (add_derived_columns) on load; for older
+# databases bootstrap.ensure_schema adds them and fills them with DERIVED_SQL.
+#   int    the code / number when it is all digits, else NULL ("090" -> 90, "BANK" -> NULL)
+#   year   / month of an ISO 'YYYY-MM-DD' date, NULL for blanks
+DERIVED_COLUMNS = {
+    "journalsraw": {
+        "accountcode_int": ("int", "accountcode"),
+        "referencenumber_int": ("int", "referencenumber"),
+        "period_year": ("year", "journaldate"),
+        "period_month": ("month", "journaldate"),
+    },
+    "tb_client": {
+        "accountcode_int": ("int", "accountcode"),
+        "period_year": ("year", "date"),
+        "period_month": ("month", "date"),
+    },
+    "pnl_client": {
+        "period_year": ("year", "date"),
+        "period_month": ("month", "date"),
+    },
+    # copied from journalsraw by shielded_expense
+    "journal_processed": {
+        "accountcode_int": ("int", "accountcode"),
+        "referencenumber_int": ("int", "referencenumber"),
+        "period_year": ("year", "journaldate"),
+        "period_month": ("month", "journaldate"),
+    },
+}
+
+# (kind, dialect) -> SQL for the backfill; same results as transform's pandas version
+DERIVED_SQL = {
+    ("int", "sqlite"): "CASE WHEN {src} <> '' AND {src} NOT GLOB '*[^0-9]*' THEN CAST({src} AS INTEGER) END",
+    ("int", "postgresql"): "CASE WHEN {src} ~ '^[0-9]+$' THEN CAST({src} AS BIGINT) END",
+    ("year", "sqlite"): "CASE WHEN {src} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN CAST(substr({src}, 1, 4) AS INTEGER) END",
+    ("year", "postgresql"): "CASE WHEN CAST({src} AS TEXT) ~ '^[0-9]{{4}}-[0-9]{{2}}' THEN CAST(substr(CAST({src} AS TEXT), 1, 4) AS INTEGER) END",
+    ("month", "sqlite"): "CASE WHEN {src} GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]*' THEN CAST(substr({src}, 6, 2) AS INTEGER) END",
+    ("month", "postgresql"): "CASE WHEN CAST({src} AS TEXT) ~ '^[0-9]{{4}}-[0-9]{{2}}' THEN CAST(substr(CAST({src} AS TEXT), 6, 2) AS INTEGER) END",
+}
+
+#--------------------------------------------------------------------------------
+
+#----------------------------------------------------------------------------------------------------------
+
+# Secondary indexes. bootstrap.ensure_schema creates every entry (IF NOT EXISTS, so reruns are free);
+# queryplan.py checks the expense / upsert / sync queries still use them.
+JOURNALS_TENANT_DATE_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_tenant_date ON journalsraw (tenant_id, journaldate);
+"""
+
+# insertions.HIGH_WATER_SQL: MAX() is one index probe. Without it the tenant_date index gets
+# picked and MAX() fetches every row of the tenant (slower than a scan).
+JOURNALS_TENANT_REFNUM_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_tenant_refnum_int ON journalsraw (tenant_id, referencenumber_int);
+"""
+
+# shielded_expense: accountcode_int IN (...) probes per code, then the year range in the same index
+JOURNALS_TENANT_ACCOUNT_YEAR_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_tenant_account_year ON journalsraw (tenant_id, accountcode_int, period_year);
+"""
+
+# reverse of the expense join (journalsraw.journalid = manualjournalsraw.manualjournalid)
+JOURNALS_JOURNALID_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_journalid ON journalsraw (journalid);
+"""
+
+JOURNALS_ACCOUNTID_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_accountid ON journalsraw (accountid);
+"""
+
+JOURNALS_ACCOUNTCODE_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journalsraw_accountcode ON journalsraw (accountcode);
+"""
+
+ACCOUNTS_CODE_IDX = """
+CREATE INDEX IF NOT EXISTS ix_accountsraw_tenant_code ON accountsraw (tenant_id, code);
+"""
+
+MANUALJOURNALS_TENANT_DATE_IDX = """
+CREATE INDEX IF NOT EXISTS ix_manualjournalsraw_tenant_date ON manualjournalsraw (tenant_id, date);
+"""
+
+JOURNAL_PROCESSED_TENANT_IDX = """
+CREATE INDEX IF NOT EXISTS ix_journal_processed_tenant ON journal_processed (tenant_id, journaldate);
+"""
+
+TB_TENANT_PERIOD_IDX = """
+CREATE INDEX IF NOT EXISTS ix_tb_client_tenant_period ON tb_client (tenant_id, period_year, period_month);
+"""
+
+PNL_TENANT_PERIOD_IDX = """
+CREATE INDEX IF NOT EXISTS ix_pnl_client_tenant_period ON pnl_client (tenant_id, period_year, period_month);
+"""
+
+# Superseded indexes, dropped by bootstrap.ensure_schema
+RETIRED_INDEXES = [
+    "ix_journalsraw_tenant_refnum",  # CAST(referencenumber AS INTEGER) expression, now referencenumber_int
+]
+
+# The DDL above is written for SQLite; these are the only spots Postgres reads differently
+# (REAL is 4-byte there, and AUTOINCREMENT does not exist)
+POSTGRES_TYPES = [
+    (r"INTEGER PRIMARY KEY AUTOINCREMENT", "SERIAL PRIMARY KEY"),
+    (r"\bREAL\b", "DOUBLE PRECISION"),
+]
+
+
+def ddl_for(ddl: str, dialect: str) -> str:
+    if dialect == "postgresql":
+        for pattern, repl in POSTGRES_TYPES:
+            ddl = re.sub(pattern, repl, ddl)
+    return ddl
+
+
+SECONDARY_INDEXES = [
+    JOURNALS_FINGERPRINT_IDX,
+    JOURNALS_TENANT_DATE_IDX,
+    JOURNALS_TENANT_REFNUM_IDX,
+    JOURNALS_TENANT_ACCOUNT_YEAR_IDX,
+    JOURNALS_JOURNALID_IDX,
+    JOURNALS_ACCOUNTID_IDX,
+    JOURNALS_ACCOUNTCODE_IDX,
+    ACCOUNTS_CODE_IDX,
+    MANUALJOURNALS_TENANT_DATE_IDX,
+    MANUALJOURNAL_LINES_JOURNAL_IDX,
+    BANKTRANSACTIONS_ACCOUNT_DATE_IDX,
+    JOURNAL_PROCESSED_TENANT_IDX,
+    TB_TENANT_PERIOD_IDX,
+    PNL_TENANT_PERIOD_IDX,
+]
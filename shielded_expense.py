@@ -3,13 +3,14 @@ from sqlalchemy import select,func,text,bindparam
 from sqlalchemy.exc import SQLAlchemyError
 from db_config import SessionLocal
 import pandas as pd
-from schemas import JOURNAL_PROCESS
+from schemas import JOURNAL_PROCESS, DERIVED_COLUMNS, ddl_for
 from gsheet import sheetdump
+from xerotokens import get_tenant_id
 
 def ensure_schema():
     with engine.begin() as conn:
         #conn.execute(text("""DROP TABLE IF EXISTS journal_processed"""))
-        conn.execute(text(JOURNAL_PROCESS))
+        conn.execute(text(ddl_for(JOURNAL_PROCESS, conn.dialect.name)))
 
 ensure_schema()
 
@@ -41,13 +42,21 @@ SELECT
     j2.showoncashbasisreports, 
     j2.hasattachments,
     j3.class,
-    j3.reportingcodename
+    j3.reportingcodename,
+    j1.debit_cents,
+    j1.credit_cents,
+    j1.grossamount_cents,
+    j1.netamount_cents,
+    j1.accountcode_int,
+    j1.referencenumber_int,
+    j1.period_year,
+    j1.period_month
 FROM journalsraw j1 
 LEFT JOIN manualjournalsraw j2 
     ON j1.journalid = j2.manualjournalid
 LEFT JOIN accountsraw j3 
     ON j1.accountid = j3.accountid
-WHERE CAST(j1.accountcode AS INTEGER) IN (
+WHERE j1.accountcode_int IN (
     820,
     400000, 400002, 400005, 400010, 400020, 400200,
     401000, 402000, 410000,
@@ -66,11 +75,13 @@ WHERE CAST(j1.accountcode AS INTEGER) IN (
     800000, 800006, 800100, 800305,
     900000, 910000
 )
-  AND substr(j1.journaldate, 1, 4) = '2025'
-  AND j1.tenant_id = 'd7418ac2-e3ec-488b-b942-5bfef34ff7b7'
-  AND (j2.status LIKE '%POSTED%' OR j2.status IS NULL)
-  AND j3.status LIKE '%active%'
-ORDER BY CAST(j1.referencenumber AS INTEGER) ASC;
+  AND j1.period_year = 2025
+  AND j1.tenant_id = :tenant_id
+  AND (UPPER(j2.status) LIKE '%POSTED%' OR j2.status IS NULL)
+  AND UPPER(j3.status) LIKE '%ACTIVE%'  -- LIKE is case-sensitive on Postgres
+-- unary + keeps SQLite from walking the whole tenant in referencenumber_int order to skip the sort;
+-- the account/year index finds the ~1% of rows wanted and sorting those is far cheaper
+ORDER BY +j1.referencenumber_int ASC;
 """)
 
 
@@ -100,7 +111,15 @@ INSERT INTO journal_processed (
   showoncashbasisreports,
   hasattachments,
   class,
-  reportingcodename
+  reportingcodename,
+  debit_cents,
+  credit_cents,
+  grossamount_cents,
+  netamount_cents,
+  accountcode_int,
+  referencenumber_int,
+  period_year,
+  period_month
 )
 SELECT
   t.tenant_id,
@@ -126,7 +145,15 @@ SELECT
   t.showoncashbasisreports,
   t.hasattachments,
   t.class,
-  t.reportingcodename
+  t.reportingcodename,
+  t.debit_cents,
+  t.credit_cents,
+  t.grossamount_cents,
+  t.netamount_cents,
+  t.accountcode_int,
+  t.referencenumber_int,
+  t.period_year,
+  t.period_month
 FROM journal_temp t
 WHERE NOT EXISTS (
   SELECT 1
@@ -160,20 +187,47 @@ SET
   showoncashbasisreports    = t.showoncashbasisreports,
   hasattachments            = t.hasattachments,
   class                     = t.class,
-  reportingcodename         = t.reportingcodename
+  reportingcodename         = t.reportingcodename,
+  debit_cents               = t.debit_cents,
+  credit_cents              = t.credit_cents,
+  grossamount_cents         = t.grossamount_cents,
+  netamount_cents           = t.netamount_cents,
+  accountcode_int           = t.accountcode_int,
+  referencenumber_int       = t.referencenumber_int,
+  period_year               = t.period_year,
+  period_month              = t.period_month
 FROM journal_temp AS t
 WHERE t.journallineid = p.journallineid;
 """)
 
 SQL_DROP_TEMP = text("""DROP TABLE IF EXISTS journal_temp;""")
 
+# max() on the number, not the text ("99" > "100" as strings); the column keeps its old name for the sheet
+SQL_SELECT_PROCESSED = text("""SELECT a.*, max(a.referencenumber_int) AS "max(a.referencenumber)" from journal_processed a
+      where a.tenant_id = :tenant_id
+      group by a.journaldate, a.accountcode, a.accountid, a.accountname, a.accounttype, abs(a.grossamount_cents)
+      order by a.referencenumber_int ASC;""")
+
+# Postgres has no bare columns next to max(); DISTINCT ON keeps the same row per group (highest referencenumber_int)
+SQL_SELECT_PROCESSED_PG = text("""SELECT * FROM (
+      SELECT DISTINCT ON (a.journaldate, a.accountcode, a.accountid, a.accountname, a.accounttype, abs(a.grossamount_cents))
+             a.*, a.referencenumber_int AS "max(a.referencenumber)"
+      from journal_processed a
+      where a.tenant_id = :tenant_id
+      order by a.journaldate, a.accountcode, a.accountid, a.accountname, a.accounttype, abs(a.grossamount_cents),
+               a.referencenumber_int DESC NULLS LAST
+      ) d
+      order by d.referencenumber_int ASC NULLS FIRST;""")
+
 
 #--------------------------------------------------------------------
-def main():
+def main(tenant_id: str | None = None, tab_suffix: str = ""):
+  # one tenant per run; journal_processed holds every tenant side by side
+  tenant_id = tenant_id or get_tenant_id()
 
   with SessionLocal.begin() as session:
       try:
-          session.execute(SQL_CREATE_TEMP)
+          session.execute(SQL_CREATE_TEMP, {"tenant_id": tenant_id})
           session.execute(SQL_INSERT_NEW)
           session.execute(SQL_UPDATE_EXISTING) 
           session.execute(SQL_DROP_TEMP)
@@ -186,18 +240,20 @@ def main():
   #-------------------------------------------------------------------
 
   with SessionLocal() as session:
-      data=session.execute(text("""SELECT a.*, max(a.referencenumber) from journal_processed a
-      group by a.journaldate, a.accountcode, a.accountid, a.accountname, a.accounttype, abs(a.grossamount)
-      order by CAST(a.referencenumber AS INTEGER) ASC;"""))
+      select = SQL_SELECT_PROCESSED_PG if session.get_bind().dialect.name == "postgresql" else SQL_SELECT_PROCESSED
+      data=session.execute(select, {"tenant_id": tenant_id})
 
       rows = data.fetchall()
       session.commit()
 
 
   df = pd.DataFrame(rows)
+  # the sheet shows the display amounts and text codes; *_cents and the typed copies are for SQL only
+  derived = DERIVED_COLUMNS["journal_processed"]
+  df = df.drop(columns=[c for c in df.columns if c.endswith("_cents") or c in derived])
   print(df)
 
-  sheetdump(df,"accounttrans")
+  sheetdump(df,"accounttrans",tab_suffix)
 
 if __name__=="__main__":
   main()
\ No newline at end of file
@@ -0,0 +1,230 @@
+import os
+import time
+import queue
+import threading
+import multiprocessing
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from insertions import (
+    UpsertResult, JOURNAL_BATCH_SIZE, journal_offset, journal_rows, write_journal_batch,
+    manualjournal_since, write_MANUALJOURNALS, fetch_ACCOUNTS, write_ACCOUNTS, master_load,
+)
+import pandas as pd
+from transform import iter_journals, iter_manualjournals
+from xerotokens import get_access_token, set_tenant_id
+from xerosummary_connections import get_tenants
+from xeroclient import print_stats
+import xerocache
+import shielded_expense
+
+# One-process replacement for the trigger.sh chain (manualjournal -> account -> shielded_expense).
+#
+# Accounts, ManualJournals and Journals are fetched on their own threads (xeroratelimit keeps
+# them inside the tenant's budget). Everything they produce goes through one queue to a single
+# writer, so the database only ever sees one connection writing. Journals are written in
+# JOURNAL_BATCH_SIZE batches while later pages are still being fetched.
+
+QUEUE_FRAMES = 8  # bounds memory if Xero is faster than the database
+
+# sync --all-tenants: one worker process per tenant, this many at once. Inside a tenant the
+# xeroratelimit governor still caps concurrent calls (XERO_MAX_CONCURRENT) across all processes.
+TENANT_WORKERS = int(os.environ.get("XERO_TENANT_WORKERS", "4"))
+_DONE = object()
+
+
+class _Timings:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = defaultdict(float)
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] += seconds
+
+
+def _put(q: queue.Queue, item, stop: threading.Event) -> None:
+    # never block forever on a full queue once the writer has given up
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return
+        except queue.Full:
+            continue
+
+
+def _fetch_frame(name: str, fetch, full: bool, q, stop, timings: _Timings) -> None:
+    t0 = time.perf_counter()
+    try:
+        # fetch returns its frame(s) then the sync timestamp: (df, ts)
+        *frames, sync_started = fetch(full)
+        _put(q, (name, (frames, sync_started)), stop)
+    except Exception as e:
+        _put(q, (name, e), stop)
+    finally:
+        timings.add(f"fetch {name}", time.perf_counter() - t0)
+        _put(q, (name, _DONE), stop)
+
+
+def _fetch_journals(full: bool, q, stop, timings: _Timings) -> None:
+    t0 = time.perf_counter()
+    try:
+        for df in iter_journals(journal_offset(full)):
+            if stop.is_set():
+                break
+            _put(q, ("Journals", df), stop)
+    except Exception as e:
+        _put(q, ("Journals", e), stop)
+    finally:
+        timings.add("fetch Journals", time.perf_counter() - t0)
+        _put(q, ("Journals", _DONE), stop)
+
+
+def _fetch_manualjournals(full: bool, q, stop, timings: _Timings) -> None:
+    # page by page like journals: ((df, lines), None) per page, then empty frames carrying the
+    # sync timestamp, so write_MANUALJOURNALS moves the delta mark only after every page
+    t0 = time.perf_counter()
+    try:
+        modified_since, sync_started = manualjournal_since(full)
+        for df, lines in iter_manualjournals(modified_since):
+            if stop.is_set():
+                break
+            _put(q, ("ManualJournals", ((df, lines), None)), stop)
+        else:
+            _put(q, ("ManualJournals", ((pd.DataFrame(), pd.DataFrame()), sync_started)), stop)
+    except Exception as e:
+        _put(q, ("ManualJournals", e), stop)
+    finally:
+        timings.add("fetch ManualJournals", time.perf_counter() - t0)
+        _put(q, ("ManualJournals", _DONE), stop)
+
+
+def run_sync(full: bool = False, expense: bool = True, tab_suffix: str = "") -> dict:
+    """
+    Fetches the three endpoints concurrently, loads them through one writer and then
+    rebuilds journal_processed / the accounttrans sheet. Returns per-endpoint UpsertResults.
+    """
+    timings = _Timings()
+    results = defaultdict(UpsertResult)
+    q: queue.Queue = queue.Queue(maxsize=QUEUE_FRAMES)
+    stop = threading.Event()
+    started = time.perf_counter()
+
+    writers = {"Accounts": write_ACCOUNTS}
+    fetchers = [
+        (_fetch_manualjournals, ()),
+        (_fetch_frame, ("Accounts", fetch_ACCOUNTS)),
+        (_fetch_journals, ()),
+    ]
+
+    with ThreadPoolExecutor(max_workers=len(fetchers), thread_name_prefix="xero-fetch") as pool:
+        for fn, args in fetchers:
+            pool.submit(fn, *args, full, q, stop, timings)
+
+        pending = len(fetchers)
+        batch: list[dict] = []
+        try:
+            while pending:
+                name, item = q.get()
+                if item is _DONE:
+                    pending -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+
+                t0 = time.perf_counter()
+                if name == "Journals":
+                    batch.extend(journal_rows(item))
+                    if len(batch) >= JOURNAL_BATCH_SIZE:
+                        results[name] += write_journal_batch(batch)
+                        batch = []
+                elif name == "ManualJournals":
+                    # lines are reported as their own stage next to the journals
+                    (df, lines), sync_started = item
+                    journals, journal_lines = write_MANUALJOURNALS(df, lines, sync_started)
+                    results[name] += journals
+                    results["ManualJournalLines"] += journal_lines
+                else:
+                    frames, sync_started = item
+                    results[name] += writers[name](*frames, sync_started)
+                timings.add(f"write {name}", time.perf_counter() - t0)
+
+            if batch:
+                t0 = time.perf_counter()
+                results["Journals"] += write_journal_batch(batch)
+                timings.add("write Journals", time.perf_counter() - t0)
+        finally:
+            # lets the fetch threads drop out instead of waiting on a queue nobody reads
+            stop.set()
+
+    timings.add("fetch + load (wall)", time.perf_counter() - started)
+
+    if expense:
+        t0 = time.perf_counter()
+        shielded_expense.main(tab_suffix=tab_suffix)
+        timings.add("expense build", time.perf_counter() - t0)
+
+    timings.add("total", time.perf_counter() - started)
+
+    for name, result in results.items():
+        print(f"Upserted rows {name}: {result}")
+    print_timings(timings.seconds)
+    return dict(results)
+
+
+def print_timings(seconds: dict) -> None:
+    print("Stage timings:")
+    width = max(len(k) for k in seconds)
+    for stage, s in seconds.items():
+        print(f"  {stage:<{width}}  {s:8.2f}s")
+
+
+#-------------------------------------ALL TENANTS-----------------------------------------------
+
+def _sync_tenant(tenant: dict, full: bool, expense: bool, cache_mode: str) -> dict:
+    # runs in its own process: pin the tenant, then the same single-tenant sync as above
+    xerocache.set_mode(cache_mode)
+    set_tenant_id(tenant["tenant_id"])
+    print(f"[sync] {tenant['tenant_name']} ({tenant['tenant_id']}) started", flush=True)
+    master_load()
+    results = run_sync(full=full, expense=expense, tab_suffix=f" - {tenant['tenant_name']}")
+    print_stats()
+    return results
+
+
+def run_sync_all(full: bool = False, expense: bool = True, workers: int = TENANT_WORKERS,
+                 tenants: list[dict] | None = None) -> dict:
+    """
+    Syncs every organisation on /connections (or the given tenants) into the same database,
+    each tenant in its own worker process. Returns {tenant_id: {endpoint: UpsertResult}};
+    one tenant failing does not stop the others, but the run raises at the end.
+    """
+    tenants = tenants if tenants is not None else get_tenants()
+    if not tenants:
+        raise RuntimeError("No organisations connected to this Xero token")
+
+    # refresh once here so the workers start from a valid token instead of racing to rotate it
+    get_access_token()
+
+    out, failed = {}, {}
+    # spawn, not fork: the parent already holds SQLite / HTTP connections that must not be shared
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(tenants))), mp_context=ctx) as pool:
+        futures = {
+            pool.submit(_sync_tenant, t, full, expense, xerocache.get_mode()): t
+            for t in tenants
+        }
+        for fut in as_completed(futures):
+            t = futures[fut]
+            try:
+                out[t["tenant_id"]] = fut.result()
+                print(f"[sync] {t['tenant_name']}: done", flush=True)
+            except Exception as e:
+                failed[t["tenant_name"]] = e
+                print(f"[sync] {t['tenant_name']}: FAILED {e!r}", flush=True)
+
+    for t in tenants:
+        for name, result in out.get(t["tenant_id"], {}).items():
+            print(f"{t['tenant_name']:<30} {name:<18} {result}")
+    if failed:
+        raise RuntimeError(f"sync failed for {len(failed)}/{len(tenants)} tenants: {', '.join(failed)}")
+    return out
@@ -1,31 +1,29 @@
 import argparse
 from datetime import datetime
 import pandas as pd
-from process_TB import load_tb_for_date, flatten_trial_balance, to_dataframe_tb
-from process_PNL import load_pl_json, flatten_pl, rows_to_dataframe
-from process_journals import trigger_journal
-from process_manualjournals import trigger_manualjournal
+from process_TB import load_tb_for_date, load_tb_for_dates, flatten_trial_balance, to_dataframe_tb
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from process_PNL import load_pl_json, load_pl_rows, flatten_pl, rows_to_dataframe
+from process_journals import trigger_journal, iter_journal_frames
+from process_manualjournals import trigger_manualjournal, iter_manualjournal_frames, manual_journal_lines_df
 from process_accounts import trigger_accounts
+from process_banktrans import iter_bank_frames
 import hashlib
+from hashing import sha256_rows, row_hash
 import json
 import os
+from xerotokens import get_tenant_id
+from money import to_cents, from_cents
+from schemas import MONEY_COLUMNS, DERIVED_COLUMNS
 
 
-
-TOKENS_FILE = "xero_tokens.json"
-
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-tokens = load_tokens()
-
-tenant_id=os.environ.get("tenant_id") or tokens.get("tenant_id")
-
+# The tenant is looked up per call (xerotokens.get_tenant_id), not once at import:
+# a multi-tenant sync pins a different tenant in every worker process.
 
 def master_data():
     # Create a single-row DataFrame with the EXACT column name used later:
-    df = pd.DataFrame([{"tenant_id": tenant_id}])  # <-- note: 'tenant_id'
+    df = pd.DataFrame([{"tenant_id": get_tenant_id()}])  # <-- note: 'tenant_id'
     return df
 
 
@@ -49,8 +47,40 @@ def normalize_date_col(df: pd.DataFrame, col: str = "date") -> pd.DataFrame:
     return df
 
 
+def _digits_to_int(s: pd.Series) -> pd.Series:
+    # "090" -> 90; anything that is not all digits ("BANK", "", None) -> <NA>
+    txt = s.astype("string")
+    ok = txt.str.fullmatch(r"[0-9]+").fillna(False).astype(bool)
+    return pd.to_numeric(txt.where(ok), errors="coerce").astype("Int64")
+
+
+def _iso_part(s: pd.Series, start: int, stop: int) -> pd.Series:
+    # year (0:4) / month (5:7) of 'YYYY-MM-DD...' strings; blanks -> <NA>
+    txt = s.astype("string")
+    ok = txt.str.match(r"[0-9]{4}-[0-9]{2}").fillna(False).astype(bool)
+    return pd.to_numeric(txt.str.slice(start, stop).where(ok), errors="coerce").astype("Int64")
+
+
+_DERIVE = {
+    "int": _digits_to_int,
+    "year": lambda s: _iso_part(s, 0, 4),
+    "month": lambda s: _iso_part(s, 5, 7),
+}
+
+
+def add_derived_columns(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    """Typed copies of code/number/date columns (schemas.DERIVED_COLUMNS), one pass per column."""
+    derived = {}
+    for col, (kind, src) in DERIVED_COLUMNS[table].items():
+        if src in df.columns:
+            derived[col] = _DERIVE[kind](df[src])
+    return df.assign(**derived)
+
+
 #-------------------------FOR TB------------------------------------------------------------
 
+TB_HASH_COLS = ["tenant_id", "date", "section", "label", "accountid", "accountcode"]
+
 def transform_tb(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df.columns = (
@@ -75,27 +105,28 @@ def transform_tb(df: pd.DataFrame) -> pd.DataFrame:
         rename_map["ytd_credit"] = "credit"
     if rename_map:
         df = df.rename(columns=rename_map)
-    df['tenant_id']=tenant_id
+    df['tenant_id']=get_tenant_id()
+
+    # report cells are text: exact cents per column, display floats derived from them
+    for col in MONEY_COLUMNS["tb_client"]:
+        if col in df.columns:
+            df[f"{col}_cents"] = to_cents(df[col])
+            df[col] = from_cents(df[f"{col}_cents"])
 
     for col in ("tenant_id","date", "section", "label", "accountid", "accountcode"):
         if col not in df.columns:
             df[col] = ""
 
-    normalized_key = (
-        df["tenant_id"].astype(str).str.strip().str.lower()       + "|" +
-        df["date"].astype(str).str.strip().str.lower()       + "|" +
-        df["section"].astype(str).str.strip().str.lower()     + "|" +
-        df["label"].astype(str).str.strip().str.lower()       + "|" +
-        df["accountid"].astype(str).str.strip().str.lower()   + "|" +
-        df["accountcode"].astype(str).str.strip().str.lower()
-    )
-
-    df["row_hash"] = normalized_key.apply(lambda s: hashlib.sha256(s.encode("utf-8")).hexdigest())   
+    # same key as always: tenant|date|section|label|accountid|accountcode (see hashing.ROW_HASH_MODE)
+    df["row_hash"] = row_hash(df, TB_HASH_COLS)
     s = df.pop("row_hash")
     df.insert(0, "row_hash", s)
     
     s = df.pop("tenant_id")
-    df.insert(0, "tenant_id", tenant_id)
+    df.insert(0, "tenant_id", s)
+
+    # not part of row_hash: derived from date / accountcode above
+    df = add_derived_columns(df, "tb_client")
     return df
 
 
@@ -110,9 +141,59 @@ def trigger_TB(date_str: str) -> pd.DataFrame:
     return df
 
 
+# Month-end close: many TB dates in one go
+TB_EVERY = {
+    "month-end": pd.offsets.MonthEnd(),
+    "quarter-end": pd.offsets.QuarterEnd(),
+    "year-end": pd.offsets.YearEnd(),
+}
+TB_FLATTEN_WORKERS = int(os.environ.get("TB_FLATTEN_WORKERS", str(min(os.cpu_count() or 1, 8))))
+
+
+def tb_dates(from_date: str, to_date: str, every: str = "month-end") -> list[str]:
+    return [d.strftime("%Y-%m-%d") for d in pd.date_range(from_date, to_date, freq=TB_EVERY[every])]
+
+
+def trigger_TB_many(dates: list[str]) -> pd.DataFrame:
+    ondates = [datetime.strptime(d, "%Y-%m-%d") for d in dates]
+    reports = load_tb_for_dates(ondates)  # concurrent; locked dates come from report_store
+
+    # flattening is pure Python per report, so it goes to a process pool when there is enough of it
+    if TB_FLATTEN_WORKERS > 1 and len(reports) > 1:
+        # spawn, not fork: same reason as sync.run_sync_all (open SQLite / HTTP connections in the parent)
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(TB_FLATTEN_WORKERS, len(reports)), mp_context=ctx) as pool:
+            flattened = list(pool.map(flatten_trial_balance, reports))
+    else:
+        flattened = [flatten_trial_balance(r) for r in reports]
+
+    frames = [to_dataframe_tb(rows, ondate) for rows, ondate in zip(flattened, ondates)]
+    df = transform_tb(pd.concat(frames, ignore_index=True))
+    return df
+
+
+def tb_wide(df: pd.DataFrame) -> pd.DataFrame:
+    """One row per account, one column per TB date, net balance (debit - credit)."""
+    fixed = ["section", "accountcode", "label", "accountid"]
+    # summed in cents, converted back for the sheet at the end
+    net = df.assign(net=df["debit_cents"].fillna(0) - df["credit_cents"].fillna(0))
+    net[fixed] = net[fixed].fillna("")  # null keys would otherwise drop the account from the pivot
+    wide = (
+        net.pivot_table(index=fixed, columns="date", values="net", aggfunc="sum")
+        .reset_index()
+    )
+    wide.columns.name = None
+    date_cols = sorted(c for c in wide.columns if c not in fixed)
+    for c in date_cols:
+        wide[c] = from_cents(wide[c])
+    return wide[fixed + date_cols]
+
+
 
 #------------------------------------FOR PnL---------------------------------------
 
+PNL_HASH_COLS = ["tenant_id", "date", "section", "label", "amount", "accountid"]
+
 
 
 def transform_pnl(df: pd.DataFrame) -> pd.DataFrame:
@@ -133,29 +214,26 @@ def transform_pnl(df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.sort_values(by="date", ascending=True)
 
-    df['tenant_id']=tenant_id
+    df['tenant_id']=get_tenant_id()
 
     # ensure required columns exist (empty if missing)
     for col in ["tenant_id","date", "section", "label", "amount", "accountid"]:
         if col not in df.columns:
             df[col] = ""
 
-    normalized_key = (
-        df["tenant_id"].astype(str).str.strip().str.lower()   + "|" +
-        df["date"].astype(str).str.strip().str.lower()   + "|" +
-        df["section"].astype(str).str.strip().str.lower()    + "|" +
-        df["label"].astype(str).str.strip().str.lower()      + "|" +
-        df["amount"].astype(str).str.strip().str.lower()  + "|" +
-        df["accountid"].astype(str).str.strip().str.lower()
-    )
+    # before row_hash: the float amount from cents is the same value the hash always saw
+    df["amount_cents"] = to_cents(df["amount"])
+    df["amount"] = from_cents(df["amount_cents"])
 
-    df["row_hash"] = normalized_key.apply(lambda s: hashlib.sha256(s.encode("utf-8")).hexdigest())
+    # same key as always: tenant|date|section|label|amount|accountid (see hashing.ROW_HASH_MODE)
+    df["row_hash"] = row_hash(df, PNL_HASH_COLS)
     s = df.pop("row_hash")
     df.insert(0, "row_hash", s)
 
     s = df.pop("tenant_id")
-    df.insert(0, "tenant_id", tenant_id)
+    df.insert(0, "tenant_id", s)
 
+    df = add_derived_columns(df, "pnl_client")
     return df
 
 def trigger_pnl(fromdate: str, todate: str, period: int | None = None, timeframe: str | None = None) -> pd.DataFrame:
@@ -163,17 +241,8 @@ def trigger_pnl(fromdate: str, todate: str, period: int | None = None, timeframe
     ondate = datetime.strptime(fromdate, "%Y-%m-%d")
     tilldate = datetime.strptime(todate, "%Y-%m-%d")
 
-    if period and timeframe:
-        report =  load_pl_json(ondate, tilldate, period, timeframe)
-    elif period:
-        report =  load_pl_json(ondate,tilldate,period)
-    elif timeframe:
-        report =  load_pl_json(ondate,tilldate,timeframe)
-    else:
-        report = load_pl_json(ondate,tilldate)
-
-    
-    rows = flatten_pl(report)
+    # any number of periods: split into <=11-period windows, fetched together and merged
+    rows = load_pl_rows(ondate, tilldate, period, timeframe)
     df = rows_to_dataframe(rows)
     df = transform_pnl(df)
 
@@ -184,6 +253,18 @@ def trigger_pnl(fromdate: str, todate: str, period: int | None = None, timeframe
 
 #------------------------------------FOR Jornals---------------------------------------
 
+# Every journal column that can change; journallineid is included so identical lines never collide
+JOURNAL_FINGERPRINT_COLS = [
+    "tenant_id","journallineid","referencenumber","journalid","journaldate",
+    "accountid","accountcode","accounttype","accountname","description","sourcetype","reference",
+    "netamount","grossamount","taxamount","taxtype","taxname","debit","credit","createddateutc",
+    "trackingcategoriescount",
+    "trackingcategory1_name","trackingcategory1_option",
+    "trackingcategory1_trackingcategoryid","trackingcategory1_trackingoptionid",
+    "trackingcategory2_name","trackingcategory2_option",
+    "trackingcategory2_trackingcategoryid","trackingcategory2_trackingoptionid",
+]
+
 def transform_journal(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
     df.columns = (
@@ -192,11 +273,10 @@ def transform_journal(df: pd.DataFrame) -> pd.DataFrame:
           .str.lower()
           .str.replace(r"\s+", "_", regex=True))
 
-    df = df.drop(columns=[c for c in ("journalid") if c in df.columns])
-
-    df = normalize_date_col(df, "journaldate")
+    df = df.drop(columns=[c for c in ("journalid",) if c in df.columns])
 
-    df['tenant_id']=tenant_id
+    # journaldate is already ISO from process_journals (xerodates), no second parse
+    df['tenant_id']=get_tenant_id()
 
     rename_map = {}
     if "journalnumber" in df.columns:
@@ -220,8 +300,7 @@ def transform_journal(df: pd.DataFrame) -> pd.DataFrame:
         "trackingcategory2_trackingoptionid"
         ]]
 
-        return df
-    if max(list(df['trackingcategoriescount']))==1:
+    elif max(list(df['trackingcategoriescount']))==1:
 
         df = df[["tenant_id","journallineid","referencenumber","journalid","journaldate",
         "accountid","accountcode","accounttype","accountname","description","sourcetype","reference",
@@ -232,7 +311,6 @@ def transform_journal(df: pd.DataFrame) -> pd.DataFrame:
         "trackingcategory1_trackingoptionid"
         ]]
 
-        return df
 
     else:
 
@@ -242,17 +320,34 @@ def transform_journal(df: pd.DataFrame) -> pd.DataFrame:
         "trackingcategoriescount"
         ]]
 
-        return df
+    # Content fingerprint: lets the loader skip lines that have not changed since the last run
+    df = df.assign(row_fingerprint=sha256_rows(df, JOURNAL_FINGERPRINT_COLS, lower=False))
+
+    # cents derive from the amounts above, so they stay out of the fingerprint
+    df = df.assign(**{f"{c}_cents": to_cents(df[c]) for c in MONEY_COLUMNS["journalsraw"]})
+    # so are the typed accountcode / referencenumber / period columns
+    df = add_derived_columns(df, "journalsraw")
+
+    return df
 
 
 
-def trigger_journals() -> pd.DataFrame:
-    df = trigger_journal()
+def trigger_journals(offset: int = 0) -> pd.DataFrame:
+    df = trigger_journal(offset)
+    if df.empty:
+        # nothing new since the stored high-water mark
+        return df
     df = transform_journal(df)
     #print(df)
     return df
 
 
+def iter_journals(offset: int = 0):
+    # Streaming variant of trigger_journals: one transformed frame per fetched page
+    for df in iter_journal_frames(offset):
+        yield transform_journal(df)
+
+
 #----------------------------------------------------For Manual Journal------------------------------------------
 
 
@@ -266,10 +361,9 @@ def transform_manualjournal(df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.drop(columns=[c for c in ("date_raw","updateddateutc_raw","journallinescount","journallinesjson","journallines") if c in df.columns])
 
-    df = normalize_date_col(df, "date")
-    df = normalize_date_col(df, "updateddateutc")
+    # date / updateddateutc already ISO from process_manualjournals (xerodates)
 
-    df['tenant_id']=tenant_id
+    df['tenant_id']=get_tenant_id()
     rename_map = {}
     if "narration" in df.columns:
         rename_map["narration"] = "description"
@@ -291,11 +385,57 @@ def transform_manualjournal(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def trigger_manualjournals() -> pd.DataFrame:
-    df = trigger_manualjournal()
+def transform_manualjournal_lines(lines: pd.DataFrame) -> pd.DataFrame:
+    lines = lines.copy()
+    lines.columns = (
+        lines.columns
+          .str.strip()
+          .str.lower()
+          .str.replace(r"\s+", "_", regex=True))
+
+    lines['tenant_id']=get_tenant_id()
+    # single-column key for upsert_rows: "<manualjournalid>:<lineindex>"
+    lines["linekey"] = lines["manualjournalid"].astype(str) + ":" + lines["lineindex"].astype(str)
+
+    lines = lines[[
+    "tenant_id",
+    "linekey",
+    "manualjournalid",
+    "lineindex",
+    "description",
+    "lineamount",
+    "accountid",
+    "accountcode",
+    "taxtype",
+    "taxamount",
+    "isblank",
+    "trackingcount",
+    "tracking1_name",
+    "tracking1_option",
+    "tracking2_name",
+    "tracking2_option"]]
+
+    lines = lines.assign(**{f"{c}_cents": to_cents(lines[c]) for c in MONEY_COLUMNS["manualjournallinesraw"]})
+
+    return lines
+
+
+def trigger_manualjournals(modified_since: str | None = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # (journals, journal lines); lines come from the parsed JournalLines before the header transform drops them
+    df = trigger_manualjournal(modified_since)
+    if df.empty:
+        return df, pd.DataFrame()
+    lines = transform_manualjournal_lines(manual_journal_lines_df(df))
     df = transform_manualjournal(df)
 
-    return df
+    return df, lines
+
+
+def iter_manualjournals(modified_since: str | None = None):
+    # Streaming variant of trigger_manualjournals: (journals, lines) per fetched page
+    for df in iter_manualjournal_frames(modified_since):
+        lines = transform_manualjournal_lines(manual_journal_lines_df(df))
+        yield transform_manualjournal(df), lines
 
 
 #---------------------------------------FOR ACCOUNTS---------------------------------------------------
@@ -312,9 +452,9 @@ def transform_accounts(df: pd.DataFrame) -> pd.DataFrame:
 
     df = df.drop(columns=[c for c in ("updateddateutc_raw") if c in df.columns])
 
-    df = normalize_date_col(df, "updateddateutc")
+    # updateddateutc already ISO from process_accounts (xerodates)
 
-    df['tenant_id']=tenant_id
+    df['tenant_id']=get_tenant_id()
 
     df = df[[
     "tenant_id",
@@ -342,11 +482,62 @@ def transform_accounts(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def trigger_account() -> pd.DataFrame:
-    df = trigger_accounts()
+def trigger_account(modified_since: str | None = None) -> pd.DataFrame:
+    df = trigger_accounts(modified_since)
+    if df.empty:
+        return df
     df = transform_accounts(df)
 
     return df
 
 
 #------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+
+#---------------------------------------FOR BANK TRANSACTIONS------------------------------------------
+
+
+def transform_banktrans(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    df.columns = (
+        df.columns
+          .str.strip()
+          .str.lower()
+          .str.replace(r"\s+", "_", regex=True))
+
+    # date / updateddateutc already ISO from process_banktrans (xerodates)
+
+    df['tenant_id']=get_tenant_id()
+
+    df = df[[
+    "tenant_id",
+    "banktransactionid",
+    "type",
+    "direction",
+    "istransfer",
+    "reference",
+    "status",
+    "isreconciled",
+    "hasattachments",
+    "lineamounttypes",
+    "subtotal",
+    "totaltax",
+    "total",
+    "currencycode",
+    "currencyrate",
+    "date",
+    "updateddateutc",
+    "bankaccountid",
+    "bankaccountcode",
+    "bankaccountname",
+    "contactid",
+    "contactname"]]
+
+    return df
+
+
+def iter_banktrans(start_date: str, end_date: str, window_days: int | None = None):
+    # One transformed frame per date window, windows fetched concurrently (process_banktrans)
+    kwargs = {"days": window_days} if window_days else {}
+    for df in iter_bank_frames(start_date, end_date, **kwargs):
+        yield transform_banktrans(df)
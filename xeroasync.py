@@ -0,0 +1,262 @@
+import asyncio
+import os
+import time
+import threading
+import httpx
+import xeroratelimit
+import xerocache
+from xeroclient import endpoint_name, RETRY_STATUSES, MAX_RETRIES, _retry_delay, _count
+from xerotokens import get_access_token, get_tenant_id
+
+# asyncio counterpart of xeroclient for calls that can run side by side
+# (several TB dates, PnL windows...). Journals still page one offset at a time
+# through the blocking client; this is for independent report requests.
+#
+# Same retry rules, stats and per-tenant rate-limit governor as xeroclient.
+# Concurrency is bounded by a semaphore; every call has its own timeout and
+# gather_json() cancels the rest of a batch as soon as one call fails.
+
+ASYNC_CONCURRENCY = int(os.environ.get("XERO_ASYNC_CONCURRENCY", os.environ.get("XERO_MAX_CONCURRENT", "5")))
+DEFAULT_TIMEOUT = float(os.environ.get("XERO_ASYNC_TIMEOUT", "60"))
+
+
+class _LeaseHandoff:
+    # xeroratelimit.acquire runs in a worker thread that cannot be cancelled. If the task
+    # awaiting it is cancelled (batch deadline, a failing sibling) the thread still gets a
+    # lease later; whichever side comes second hands it back, so the slot is never lost.
+
+    def __init__(self, tenant_id: str | None):
+        self.tenant_id = tenant_id
+        self.lease: str | None = None
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        # worker thread
+        lease = xeroratelimit.acquire(self.tenant_id)
+        with self._lock:
+            if not self.abandoned:
+                self.lease = lease
+                return
+        xeroratelimit.release(lease, self.tenant_id, None)
+
+    def abandon(self) -> str | None:
+        # task side, on cancellation: a lease the thread already handed over, if any
+        with self._lock:
+            self.abandoned = True
+            lease, self.lease = self.lease, None
+        return lease
+
+
+async def _release(lease: str | None, tenant_id: str | None, response=None) -> None:
+    # SQLite write, off the event loop; shielded so a second cancel cannot skip it
+    if lease is not None:
+        await asyncio.shield(asyncio.to_thread(xeroratelimit.release, lease, tenant_id, response))
+
+
+async def _acquire(tenant_id: str | None) -> str | None:
+    # the governor blocks on SQLite / sleeps, keep it off the event loop
+    handoff = _LeaseHandoff(tenant_id)
+    try:
+        await asyncio.to_thread(handoff.acquire)
+    except asyncio.CancelledError:
+        await _release(handoff.abandon(), tenant_id)
+        raise
+    return handoff.lease
+
+
+class AsyncXeroClient:
+    """
+    async with AsyncXeroClient() as xc:
+        tb = await xc.get_json(url, headers=..., params=...)
+        many = await xc.gather_json([(url, params), ...])
+    """
+
+    def __init__(self, concurrency: int = ASYNC_CONCURRENCY, timeout: float = DEFAULT_TIMEOUT,
+                 access_token: str | None = None, tenant_id: str | None = None):
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self._client: httpx.AsyncClient | None = None
+        self._access_token = access_token
+        self._tenant_id = tenant_id
+
+    async def __aenter__(self) -> "AsyncXeroClient":
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout)
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._client.aclose()
+        self._client = None
+
+    def headers(self) -> dict:
+        # token / tenant looked up once per client, like the blocking get_bank_summary_json helpers
+        if self._access_token is None:
+            self._access_token = get_access_token()
+        if self._tenant_id is None:
+            self._tenant_id = get_tenant_id()
+        return {
+            "Authorization": f"Bearer {self._access_token}",
+            "xero-tenant-id": self._tenant_id,
+            "Accept": "application/json",
+        }
+
+    async def request(self, method: str, url: str, timeout: float | None = None, **kwargs) -> httpx.Response:
+        endpoint = endpoint_name(url)
+        tenant_id = (kwargs.get("headers") or {}).get("xero-tenant-id")
+        timeout = self.timeout if timeout is None else timeout
+
+        for attempt in range(MAX_RETRIES + 1):
+            async with self._sem:
+                lease = await _acquire(tenant_id)
+                _count(endpoint, "requests")
+                r = None
+                try:
+                    r = await self._client.request(method, url, timeout=timeout, **kwargs)
+                except httpx.TransportError:
+                    if attempt >= MAX_RETRIES:
+                        _count(endpoint, "errors")
+                        raise
+                finally:
+                    # also runs on cancellation, so a cancelled call never keeps its slot
+                    await _release(lease, tenant_id, r)
+
+            # backoff sleeps happen outside the semaphore so other calls keep going
+            if r is None:
+                _count(endpoint, "retries")
+                await asyncio.sleep(_retry_delay(attempt, None))
+                continue
+
+            if r.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+                _count(endpoint, "retries")
+                await asyncio.sleep(_retry_delay(attempt, r))
+                continue
+
+            if r.status_code >= 400:
+                _count(endpoint, "errors")
+            r.raise_for_status()
+            return r
+
+        raise RuntimeError("unreachable")
+
+    async def get_json(self, url: str, headers: dict | None = None, params: dict | None = None,
+                       timeout: float | None = None) -> dict:
+        # cache reads/writes are file I/O, so they run in a thread like the governor
+        cached = await asyncio.to_thread(xerocache.lookup, url, headers, params)
+        if cached is not None:
+            _count(endpoint_name(url), "cache_hits")
+            return cached
+
+        r = await self.request("GET", url, headers=headers, params=params, timeout=timeout)
+        if r.status_code == 304:
+            return {}
+        payload = r.json()
+        await asyncio.to_thread(xerocache.store, url, headers, params, payload)
+        return payload
+
+    async def gather_json(self, calls: list[tuple[str, dict | None]], headers: dict | None = None,
+                          timeout: float | None = None, deadline: float | None = None) -> list[dict]:
+        """
+        Runs (url, params) calls concurrently and returns payloads in the same order.
+        timeout is per request; deadline bounds the whole batch. If any call fails (or the
+        deadline passes) the remaining ones are cancelled and the error is raised.
+        """
+        headers = headers if headers is not None else self.headers()
+
+        async def run() -> list[dict]:
+            async with asyncio.TaskGroup() as tg:
+                tasks = [tg.create_task(self.get_json(url, headers=headers, params=params, timeout=timeout))
+                         for url, params in calls]
+            return [t.result() for t in tasks]
+
+        if deadline is None:
+            return await run()
+        async with asyncio.timeout(deadline):
+            return await run()
+
+
+def gather_json(calls: list[tuple[str, dict | None]], concurrency: int = ASYNC_CONCURRENCY,
+                timeout: float | None = None, deadline: float | None = None) -> list[dict]:
+    # Blocking entry point for the process_* modules
+    async def run():
+        async with AsyncXeroClient(concurrency=concurrency) as xc:
+            return await xc.gather_json(calls, timeout=timeout, deadline=deadline)
+    return asyncio.run(run())
+
+
+if __name__ == "__main__":
+    # Sequential xeroclient vs AsyncXeroClient against a local stub that sleeps like Xero:
+    #   python xeroasync.py [requests] [latency_ms] [concurrency]
+    import sys
+    import json
+    import statistics
+    import threading
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+    from xeroclient import get_json
+
+    xerocache.set_mode("off")
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 24
+    latency = (int(sys.argv[2]) if len(sys.argv) > 2 else 250) / 1000
+    concurrency = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    with open("TB.json", "rb") as f:
+        body = f.read()
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client cancelled (deadline check below)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/api.xro/2.0/Reports/TrialBalance"
+    # no xero-tenant-id header, so the rate-limit governor stays out of the measurement
+    headers = {"Accept": "application/json"}
+    calls = [(url, {"date": f"2025-{1 + i % 12:02d}-28"}) for i in range(n)]
+
+    def report(name, total, lat):
+        # latency is per call from the moment it is issued, so for async it includes queueing
+        print(f"{name:10s} total {total:6.2f}s  {n / total:6.1f} req/s  "
+              f"latency p50 {statistics.median(lat) * 1000:6.0f}ms  max {max(lat) * 1000:6.0f}ms")
+
+    lat = []
+    t0 = time.perf_counter()
+    for u, p in calls:
+        t1 = time.perf_counter()
+        get_json(u, headers=headers, params=p)
+        lat.append(time.perf_counter() - t1)
+    report("sequential", time.perf_counter() - t0, lat)
+
+    async def timed(xc, u, p, out):
+        t1 = time.perf_counter()
+        payload = await xc.get_json(u, headers=headers, params=p)
+        out.append(time.perf_counter() - t1)
+        return payload
+
+    async def bench():
+        out = []
+        async with AsyncXeroClient(concurrency=concurrency) as xc:
+            t0 = time.perf_counter()
+            payloads = await asyncio.gather(*(timed(xc, u, p, out) for u, p in calls))
+            total = time.perf_counter() - t0
+            assert all(pl == json.loads(body) for pl in payloads)
+            report(f"async x{concurrency}", total, out)
+
+            # cancellation: a batch deadline shorter than one call must abort cleanly
+            try:
+                await xc.gather_json(calls, headers=headers, deadline=latency / 2)
+            except TimeoutError:
+                print("deadline   batch cancelled as expected")
+
+    asyncio.run(bench())
+    server.shutdown()
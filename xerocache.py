@@ -0,0 +1,211 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+# On-disk cache of raw Xero responses.
+#
+#   XERO_CACHE_DIR/refs/<key>.json      one per request: tenant + endpoint + params (+ If-Modified-Since)
+#   XERO_CACHE_DIR/blobs/<sha256>.json.gz  gzipped response body, addressed by its own hash,
+#                                        so identical payloads (unchanged reports, empty pages) are stored once
+#
+# Modes (XERO_CACHE, or set_mode() / main.py --record / --replay):
+#   off     never read or write (default)
+#   record  store every response, never serve one: a normal live run that leaves a recording
+#   replay  serve whatever was recorded regardless of age and never touch the network;
+#           a miss raises CacheMiss
+#
+# A live run is never served from the cache: Journals offset pages, the Organisation lock date
+# and open-period reports change between runs, so a cached copy would load stale data.
+#
+# Size is capped at XERO_CACHE_MAX_MB: least recently used refs go first, then orphaned blobs.
+
+CACHE_DIR = os.environ.get("XERO_CACHE_DIR", ".xero_cache")
+CACHE_MAX_MB = float(os.environ.get("XERO_CACHE_MAX_MB", "200"))
+EVICT_EVERY = 50  # stores between size checks; a journal backfill writes hundreds of pages
+
+MODES = ("off", "record", "replay")
+_mode = "off"
+_lock = threading.Lock()
+_stores = 0
+
+
+class CacheMiss(LookupError):
+    """Replay mode asked for a response that was never recorded."""
+
+
+def set_mode(mode: str) -> None:
+    global _mode
+    if mode not in MODES:
+        raise ValueError(f"cache mode must be one of {MODES}")
+    _mode = mode
+
+
+set_mode(os.environ.get("XERO_CACHE", "off").lower())
+
+
+def get_mode() -> str:
+    return _mode
+
+
+def is_replay() -> bool:
+    return _mode == "replay"
+
+
+def _endpoint(url: str) -> str:
+    path = urlparse(url).path
+    if "/api.xro/2.0/" in path:
+        path = path.split("/api.xro/2.0/", 1)[1]
+    return path.strip("/")
+
+
+def cache_key(url: str, headers: dict | None = None, params: dict | None = None) -> str:
+    headers = headers or {}
+    ident = {
+        "tenant": headers.get("xero-tenant-id"),
+        "endpoint": _endpoint(url),
+        "params": {k: str(v) for k, v in sorted((params or {}).items()) if v is not None},
+        "if_modified_since": headers.get("If-Modified-Since"),
+    }
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _ref_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, "refs", f"{key}.json")
+
+
+def _blob_path(digest: str) -> str:
+    return os.path.join(CACHE_DIR, "blobs", f"{digest}.json.gz")
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def lookup(url: str, headers: dict | None = None, params: dict | None = None):
+    """Returns the recorded payload in replay mode, None (go to Xero) otherwise."""
+    if _mode != "replay":
+        return None
+    key = cache_key(url, headers, params)
+    try:
+        with open(_ref_path(key), "r", encoding="utf-8") as f:
+            ref = json.load(f)
+        with gzip.open(_blob_path(ref["blob"]), "rb") as f:
+            payload = json.loads(f.read())
+    except (OSError, ValueError, KeyError):
+        raise CacheMiss(f"no cached response for {_endpoint(url)} {params or {}} (key {key[:12]})")
+
+    os.utime(_ref_path(key))  # LRU order for eviction
+    return payload
+
+
+def store(url: str, headers: dict | None, params: dict | None, payload, fetched_at: float | None = None) -> str | None:
+    global _stores
+    if _mode != "record":
+        return None
+    body = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    digest = hashlib.sha256(body).hexdigest()
+    key = cache_key(url, headers, params)
+
+    with _lock:
+        if not os.path.exists(_blob_path(digest)):
+            _write_atomic(_blob_path(digest), gzip.compress(body, compresslevel=6))
+        ref = {
+            "blob": digest,
+            "fetched_at": fetched_at if fetched_at is not None else time.time(),
+            "endpoint": _endpoint(url),
+            "params": params or {},
+            "tenant": (headers or {}).get("xero-tenant-id"),
+        }
+        _write_atomic(_ref_path(key), json.dumps(ref).encode("utf-8"))
+        _stores += 1
+        if _stores % EVICT_EVERY == 1:
+            evict()
+    return key
+
+
+def _dir_entries(sub: str) -> list[os.DirEntry]:
+    path = os.path.join(CACHE_DIR, sub)
+    if not os.path.isdir(path):
+        return []
+    return [e for e in os.scandir(path) if e.is_file() and not e.name.endswith(".tmp")]
+
+
+def evict(max_bytes: float | None = None) -> int:
+    """Drops least recently used refs until the cache fits, then blobs nothing points at."""
+    max_bytes = CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+    refs = _dir_entries("refs")
+    blobs = {e.name[:-len(".json.gz")]: e for e in _dir_entries("blobs")}
+    total = sum(e.stat().st_size for e in refs) + sum(e.stat().st_size for e in blobs.values())
+    if total <= max_bytes:
+        return 0
+
+    refs.sort(key=lambda e: e.stat().st_mtime)
+    owner = {}
+    uses = Counter()
+    for e in refs:
+        try:
+            with open(e.path, "r", encoding="utf-8") as f:
+                owner[e.path] = json.load(f)["blob"]
+        except (OSError, ValueError, KeyError):
+            owner[e.path] = None
+        uses[owner[e.path]] += 1
+
+    removed = 0
+    for e in refs:
+        if total <= max_bytes:
+            break
+        total -= e.stat().st_size
+        os.remove(e.path)
+        removed += 1
+        digest = owner[e.path]
+        uses[digest] -= 1
+        # the blob goes once no remaining ref points at it
+        if uses[digest] <= 0 and digest in blobs:
+            total -= blobs[digest].stat().st_size
+            os.remove(blobs.pop(digest).path)
+    return removed
+
+
+def stats() -> dict:
+    refs = _dir_entries("refs")
+    blobs = _dir_entries("blobs")
+    return {
+        "mode": _mode,
+        "refs": len(refs),
+        "blobs": len(blobs),
+        "mb": round((sum(e.stat().st_size for e in refs) + sum(e.stat().st_size for e in blobs)) / 1024 / 1024, 2),
+    }
+
+
+if __name__ == "__main__":
+    # Seed the cache from payloads already on disk so they can be replayed:
+    #   python xerocache.py seed Reports/TrialBalance TB.json date=2026-01-23
+    #   python xerocache.py seed Reports/ProfitAndLoss pnl.json fromDate=2025-01-01 toDate=2025-01-31 periods=6 timeframe=MONTH
+    #   python xerocache.py seed Accounts accounts.json
+    #   python xerocache.py stats
+    import sys
+    from xerotokens import get_tenant_id
+
+    if len(sys.argv) >= 2 and sys.argv[1] == "stats":
+        print(stats())
+    elif len(sys.argv) >= 4 and sys.argv[1] == "seed":
+        endpoint, path = sys.argv[2], sys.argv[3]
+        params = dict(a.split("=", 1) for a in sys.argv[4:])
+        with open(path, "r", encoding="utf-8") as f:
+            payload = json.load(f)
+        url = f"https://api.xero.com/api.xro/2.0/{endpoint}"
+        set_mode("record")
+        key = store(url, {"xero-tenant-id": get_tenant_id()}, params, payload,
+                    fetched_at=os.path.getmtime(path))
+        print(f"seeded {endpoint} {params} from {path} -> {key[:12]}")
+    else:
+        print("usage: python xerocache.py seed <endpoint> <file.json> [param=value ...] | stats")
@@ -0,0 +1,241 @@
+import os
+import time
+import random
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import xeroratelimit
+import xerocache
+
+# Shared HTTP layer for every xerosummary_* fetcher.
+# One pooled keep-alive session, Retry-After handling on 429 and jittered
+# exponential backoff on 5xx / connection errors. Counts requests and retries per endpoint.
+# Every tenant-scoped call is paced by xeroratelimit (minute / concurrency / day budget).
+# get_json answers from xerocache first (and only from it in replay mode).
+
+POOL_CONNECTIONS = int(os.environ.get("XERO_POOL_CONNECTIONS", "4"))
+POOL_MAXSIZE = int(os.environ.get("XERO_POOL_MAXSIZE", "10"))
+MAX_RETRIES = int(os.environ.get("XERO_MAX_RETRIES", "5"))
+BACKOFF_BASE = float(os.environ.get("XERO_BACKOFF_BASE", "1.0"))
+BACKOFF_MAX = float(os.environ.get("XERO_BACKOFF_MAX", "60"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+_session_lock = threading.Lock()
+_session: requests.Session | None = None
+
+_stats_lock = threading.Lock()
+_stats = defaultdict(lambda: {"requests": 0, "retries": 0, "errors": 0, "cache_hits": 0})
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+            s.mount("https://", adapter)
+            s.mount("http://", adapter)
+            _session = s
+        return _session
+
+
+def endpoint_name(url: str) -> str:
+    # "https://api.xero.com/api.xro/2.0/Reports/TrialBalance" -> "Reports/TrialBalance"
+    path = urlparse(url).path
+    if "/api.xro/2.0/" in path:
+        path = path.split("/api.xro/2.0/", 1)[1]
+    return path.strip("/") or url
+
+
+def _count(endpoint: str, key: str) -> None:
+    with _stats_lock:
+        _stats[endpoint][key] += 1
+
+
+def get_stats() -> dict:
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
+
+
+def print_stats() -> None:
+    for endpoint, s in sorted(get_stats().items()):
+        print(f"[xeroclient] {endpoint}: requests={s['requests']} retries={s['retries']} errors={s['errors']} "
+              f"cache_hits={s['cache_hits']}")
+
+
+def _retry_delay(attempt: int, r: requests.Response | None) -> float:
+    if r is not None and r.status_code == 429:
+        retry_after = r.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), BACKOFF_MAX)
+            except ValueError:
+                pass
+    # full jitter: uniform(0, base * 2^attempt)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def request(method: str, url: str, timeout: float = 60, **kwargs) -> requests.Response:
+    """
+    Sends a request through the pooled session, retrying 429/5xx and connection errors.
+    Raises requests.HTTPError once retries are exhausted (same as r.raise_for_status()).
+    """
+    endpoint = endpoint_name(url)
+    session = get_session()
+    tenant_id = (kwargs.get("headers") or {}).get("xero-tenant-id")
+
+    for attempt in range(MAX_RETRIES + 1):
+        lease = xeroratelimit.acquire(tenant_id)
+        _count(endpoint, "requests")
+        r = None
+        try:
+            r = session.request(method, url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            if attempt >= MAX_RETRIES:
+                _count(endpoint, "errors")
+                raise
+        finally:
+            # hand the slot back (with Xero's limit headers) before any backoff sleep
+            xeroratelimit.release(lease, tenant_id, r)
+
+        if r is None:
+            _count(endpoint, "retries")
+            time.sleep(_retry_delay(attempt, None))
+            continue
+
+        if r.status_code in RETRY_STATUSES and attempt < MAX_RETRIES:
+            _count(endpoint, "retries")
+            time.sleep(_retry_delay(attempt, r))
+            continue
+
+        if r.status_code >= 400:
+            _count(endpoint, "errors")
+        r.raise_for_status()
+        return r
+
+    raise RuntimeError("unreachable")
+
+
+def get_json(url: str, headers: dict | None = None, params: dict | None = None, timeout: float = 60) -> dict:
+    cached = xerocache.lookup(url, headers, params)  # raises CacheMiss in replay mode
+    if cached is not None:
+        _count(endpoint_name(url), "cache_hits")
+        return cached
+
+    r = request("GET", url, headers=headers, params=params, timeout=timeout)
+    if r.status_code == 304:
+        # If-Modified-Since and nothing changed
+        return {}
+    payload = r.json()
+    xerocache.store(url, headers, params, payload)
+    return payload
+
+
+PAGE_SIZE = 100
+PAGE_CONCURRENCY = int(os.environ.get("XERO_PAGE_CONCURRENCY", "4"))
+
+
+def iter_pages(fetch_page, key: str, page_size: int = PAGE_SIZE, concurrency: int = PAGE_CONCURRENCY):
+    """
+    Generic paginator for Xero's ?page=N endpoints.
+
+    fetch_page(page) must return the payload for that page; key is the list inside it
+    (e.g. "ManualJournals"). Page 1 is fetched alone; if it is full, the following pages
+    are fetched `concurrency` at a time. Payloads are yielded in page order as soon as
+    they are available, so callers can flatten and drop them one by one.
+    """
+    first = fetch_page(1)
+    yield first
+    if len(first.get(key) or []) < page_size:
+        return
+
+    next_page = 2
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        while True:
+            batch = list(range(next_page, next_page + max(1, concurrency)))
+            futures = [pool.submit(fetch_page, p) for p in batch]
+            next_page += len(batch)
+
+            done = False
+            for fut in futures:
+                payload = fut.result()
+                items = payload.get(key) or []
+                if items:
+                    yield payload
+                if len(items) < page_size:
+                    # later pages in this batch are empty past the end
+                    done = True
+                    break
+            if done:
+                for fut in futures:
+                    fut.cancel()
+                return
+
+
+if __name__ == "__main__":
+    # Retry self-check against a local stub: python xeroclient.py
+    #   1) 429 (Retry-After: 1) -> 503 -> 200 comes back with the payload after two retries
+    #   2) a stub that always answers 503 raises once MAX_RETRIES is used up
+    import json
+    from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+    xerocache.set_mode("off")
+    BACKOFF_BASE = 0.05  # keep the 5xx jitter well under the 1s Retry-After
+    MAX_RETRIES = 3
+    body = json.dumps({"Reports": [{"ReportID": "TrialBalance"}]}).encode()
+    script = []  # statuses still to serve, popped per request; empty -> 503
+    seen = []  # perf_counter() at which each request arrived
+
+    class Stub(BaseHTTPRequestHandler):
+        def do_GET(self):
+            seen.append(time.perf_counter())
+            status = script.pop(0) if script else 503
+            self.send_response(status)
+            if status == 429:
+                self.send_header("Retry-After", "1")
+            payload = body if status == 200 else b"{}"
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Stub)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_port}/api.xro/2.0"
+    # no xero-tenant-id header, so the rate-limit governor stays out of it
+    headers = {"Accept": "application/json"}
+
+    #----- 429 -> 503 -> 200
+    script[:] = [429, 503, 200]
+    payload = get_json(f"{base}/Reports/TrialBalance", headers=headers)
+    assert payload == json.loads(body), payload
+    s = get_stats()["Reports/TrialBalance"]
+    assert (s["requests"], s["retries"], s["errors"]) == (3, 2, 0), s
+    assert len(seen) == 3, seen
+    assert seen[1] - seen[0] >= 1.0, f"429 retried after {seen[1] - seen[0]:.2f}s, Retry-After was 1"
+    print(f"[xeroclient] 429 -> 503 -> 200 ok: retries={s['retries']} "
+          f"429 wait {seen[1] - seen[0]:.2f}s, 503 wait {seen[2] - seen[1]:.2f}s")
+
+    #----- retries exhausted
+    seen.clear()
+    script[:] = []
+    try:
+        get_json(f"{base}/Journals", headers=headers)
+    except requests.HTTPError as e:
+        assert e.response.status_code == 503, e.response.status_code
+    else:
+        raise AssertionError("expected HTTPError after MAX_RETRIES")
+    s = get_stats()["Journals"]
+    assert (s["requests"], s["retries"], s["errors"]) == (MAX_RETRIES + 1, MAX_RETRIES, 1), s
+    assert len(seen) == MAX_RETRIES + 1, seen
+    print(f"[xeroclient] exhausted ok: {s['requests']} requests, raised HTTPError 503")
+
+    server.shutdown()
+    print_stats()
@@ -0,0 +1,272 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+# Per-tenant Xero rate-limit governor, shared by every process on the box.
+#
+# Xero allows each tenant 60 calls/minute, 5 in flight at once and 5000 calls/day.
+# State lives in a small SQLite file (not the reports DB) so separate main.py runs
+# from trigger.sh draw from one budget:
+#   ratelimit_bucket - token bucket + last X-MinLimit/X-DayLimit-Remaining seen
+#   ratelimit_lease  - one row per request in flight (expires, so a killed process can't leak slots)
+#
+# The bucket holds BURST tokens and refills at (MINUTE_LIMIT - BURST) per minute, so no
+# rolling 60s window can ever see more than MINUTE_LIMIT calls.
+
+RATELIMIT_FILE = os.environ.get("XERO_RATELIMIT_FILE", "xero_ratelimit.sqlite")
+RATELIMIT_ENABLED = os.environ.get("XERO_RATELIMIT", "on").lower() not in ("0", "off", "false", "no")
+MINUTE_LIMIT = int(os.environ.get("XERO_MINUTE_LIMIT", "60"))
+MAX_CONCURRENT = int(os.environ.get("XERO_MAX_CONCURRENT", "5"))
+BURST = int(os.environ.get("XERO_BURST", str(MAX_CONCURRENT)))
+DAY_RESERVE = int(os.environ.get("XERO_DAY_RESERVE", "0"))  # calls kept back for ad-hoc use
+LEASE_TTL = float(os.environ.get("XERO_LEASE_TTL", "180"))  # > request timeout incl. retries of one attempt
+
+REFILL_PER_SEC = max(MINUTE_LIMIT - BURST, 1) / 60.0
+POLL_INTERVAL = 0.05
+
+DDL = [
+    """
+    CREATE TABLE IF NOT EXISTS ratelimit_bucket (
+        tenant_id       TEXT PRIMARY KEY,
+        tokens          REAL NOT NULL,
+        updated_at      REAL NOT NULL,
+        blocked_until   REAL NOT NULL DEFAULT 0,
+        day_remaining   INTEGER NULL,
+        day_seen_at     REAL NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ratelimit_lease (
+        lease_id        TEXT PRIMARY KEY,
+        tenant_id       TEXT NOT NULL,
+        expires_at      REAL NOT NULL
+    )
+    """,
+]
+
+
+class DayLimitExceeded(RuntimeError):
+    """Raised instead of waiting hours for Xero's daily allowance to come back."""
+
+
+_local = threading.local()
+_init_lock = threading.Lock()
+_initialised = False
+
+
+def _connect() -> sqlite3.Connection:
+    # one connection per thread; isolation_level=None so BEGIN IMMEDIATE is ours to issue
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(RATELIMIT_FILE, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        _local.conn = conn
+    return conn
+
+
+def _ensure_tables(conn: sqlite3.Connection) -> None:
+    global _initialised
+    with _init_lock:
+        if not _initialised:
+            for ddl in DDL:
+                conn.execute(ddl)
+            _initialised = True
+
+
+class _Txn:
+    # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write is atomic across processes
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def _bucket(conn, tenant_id: str, now: float) -> tuple[float, float, int | None, float | None]:
+    row = conn.execute(
+        "SELECT tokens, updated_at, blocked_until, day_remaining, day_seen_at FROM ratelimit_bucket WHERE tenant_id = ?",
+        (tenant_id,),
+    ).fetchone()
+    if row is None:
+        conn.execute(
+            "INSERT INTO ratelimit_bucket (tenant_id, tokens, updated_at) VALUES (?, ?, ?)",
+            (tenant_id, float(BURST), now),
+        )
+        return float(BURST), 0.0, None, None
+
+    tokens, updated_at, blocked_until, day_remaining, day_seen_at = row
+    tokens = min(float(BURST), tokens + max(now - updated_at, 0) * REFILL_PER_SEC)
+    # Xero's day window rolls; a reading older than a day says nothing any more
+    if day_seen_at is not None and now - day_seen_at > 86400:
+        day_remaining = None
+    return tokens, blocked_until, day_remaining, day_seen_at
+
+
+def _try_acquire(tenant_id: str) -> tuple[str | None, float]:
+    """Returns (lease_id, 0) on success or (None, seconds_to_wait)."""
+    conn = _connect()
+    _ensure_tables(conn)
+    now = time.time()
+
+    with _Txn(conn):
+        conn.execute("DELETE FROM ratelimit_lease WHERE expires_at < ?", (now,))
+        tokens, blocked_until, day_remaining, _ = _bucket(conn, tenant_id, now)
+
+        if day_remaining is not None and day_remaining <= DAY_RESERVE:
+            raise DayLimitExceeded(
+                f"Xero day limit reached for tenant {tenant_id} ({day_remaining} calls left, reserve {DAY_RESERVE})"
+            )
+
+        wait = 0.0
+        if blocked_until > now:
+            wait = blocked_until - now
+        elif tokens < 1:
+            wait = (1 - tokens) / REFILL_PER_SEC
+        else:
+            in_flight = conn.execute(
+                "SELECT COUNT(*) FROM ratelimit_lease WHERE tenant_id = ?", (tenant_id,)
+            ).fetchone()[0]
+            if in_flight >= MAX_CONCURRENT:
+                wait = POLL_INTERVAL
+
+        if wait > 0:
+            conn.execute("UPDATE ratelimit_bucket SET tokens = ?, updated_at = ? WHERE tenant_id = ?",
+                         (tokens, now, tenant_id))
+            return None, wait
+
+        lease_id = uuid.uuid4().hex
+        conn.execute("INSERT INTO ratelimit_lease (lease_id, tenant_id, expires_at) VALUES (?, ?, ?)",
+                     (lease_id, tenant_id, now + LEASE_TTL))
+        conn.execute(
+            "UPDATE ratelimit_bucket SET tokens = ?, updated_at = ?, "
+            "day_remaining = CASE WHEN day_remaining IS NULL THEN NULL ELSE day_remaining - 1 END "
+            "WHERE tenant_id = ?",
+            (tokens - 1, now, tenant_id),
+        )
+        return lease_id, 0.0
+
+
+def acquire(tenant_id: str) -> str | None:
+    """
+    Blocks until a call for this tenant fits in the minute, concurrency and day budget.
+    Returns a lease id to hand back to release() once the response is in.
+    """
+    if not RATELIMIT_ENABLED or not tenant_id:
+        return None
+    while True:
+        lease_id, wait = _try_acquire(tenant_id)
+        if lease_id:
+            return lease_id
+        time.sleep(wait)
+
+
+def _int_header(headers, name: str) -> int | None:
+    value = headers.get(name) if headers is not None else None
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+def release(lease_id: str | None, tenant_id: str, response=None) -> None:
+    """
+    Frees the concurrency slot and folds Xero's own counters back into the bucket:
+      X-MinLimit-Remaining  caps the tokens we think we have (other apps share the tenant)
+      X-DayLimit-Remaining  replaces our local day estimate
+      429 + Retry-After     pauses every process for that tenant
+    """
+    if lease_id is None:
+        return
+    conn = _connect()
+    now = time.time()
+    headers = getattr(response, "headers", None)
+    min_remaining = _int_header(headers, "X-MinLimit-Remaining")
+    day_remaining = _int_header(headers, "X-DayLimit-Remaining")
+    retry_after = None
+    if response is not None and response.status_code == 429:
+        ra = _int_header(headers, "Retry-After")
+        # Retry-After: 0 is a real answer (retry now), only a missing/garbled header means 60
+        retry_after = 60 if ra is None else ra
+
+    with _Txn(conn):
+        conn.execute("DELETE FROM ratelimit_lease WHERE lease_id = ?", (lease_id,))
+        tokens, blocked_until, known_day, day_seen_at = _bucket(conn, tenant_id, now)
+
+        if min_remaining is not None:
+            # minus calls still in flight, which the server has not counted yet
+            in_flight = conn.execute(
+                "SELECT COUNT(*) FROM ratelimit_lease WHERE tenant_id = ?", (tenant_id,)
+            ).fetchone()[0]
+            tokens = min(tokens, float(max(min_remaining - in_flight, 0)))
+        if day_remaining is not None:
+            known_day, day_seen_at = day_remaining, now
+        if retry_after is not None:
+            tokens = 0.0
+            blocked_until = max(blocked_until, now + retry_after)
+
+        conn.execute(
+            "UPDATE ratelimit_bucket SET tokens = ?, updated_at = ?, blocked_until = ?, "
+            "day_remaining = ?, day_seen_at = ? WHERE tenant_id = ?",
+            (tokens, now, blocked_until, known_day, day_seen_at, tenant_id),
+        )
+
+
+def status(tenant_id: str) -> dict:
+    conn = _connect()
+    _ensure_tables(conn)
+    now = time.time()
+    with _Txn(conn):
+        tokens, blocked_until, day_remaining, day_seen_at = _bucket(conn, tenant_id, now)
+        in_flight = conn.execute(
+            "SELECT COUNT(*) FROM ratelimit_lease WHERE tenant_id = ? AND expires_at >= ?", (tenant_id, now)
+        ).fetchone()[0]
+    return {
+        "tokens": round(tokens, 2),
+        "in_flight": in_flight,
+        "blocked_for": round(max(blocked_until - now, 0), 1),
+        "day_remaining": day_remaining,
+        "day_seen_utc": (datetime.fromtimestamp(day_seen_at, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+                         if day_seen_at else None),
+    }
+
+
+if __name__ == "__main__":
+    # Governor check without touching Xero: python xeroratelimit.py [calls] [workers] [tenant]
+    # (start it twice with the same tenant to see two processes share one budget)
+    # Fires fake 50ms calls from several threads and reports the worst 60s window / concurrency seen.
+    import sys
+    from concurrent.futures import ThreadPoolExecutor
+
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 80
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    tenant = sys.argv[3] if len(sys.argv) > 3 else f"bench-{uuid.uuid4().hex[:8]}"
+    starts, active, peak = [], [0], [0]
+    lock = threading.Lock()
+
+    def fake_call(_):
+        lease = acquire(tenant)
+        with lock:
+            starts.append(time.time())
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        release(lease, tenant)
+
+    t0 = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(fake_call, range(calls)))
+    elapsed = time.time() - t0
+
+    starts.sort()
+    worst = max(sum(1 for s in starts if t <= s < t + 60) for t in starts)
+    print(f"{calls} calls in {elapsed:.1f}s, worst 60s window {worst}/{MINUTE_LIMIT}, peak concurrency {peak[0]}/{MAX_CONCURRENT}")
+    print(status(tenant))
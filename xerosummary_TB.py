@@ -1,13 +1,12 @@
 import os
 import json
-import base64
-import requests
+from xeroclient import get_json
+from xerotokens import get_access_token, get_tenant_id
+from xeroasync import AsyncXeroClient, gather_json
 import argparse
 from datetime import datetime
 
-TOKEN_URL = "https://identity.xero.com/connect/token"
 ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
-TOKENS_FILE = "xero_tokens.json"
 
 # This code takes info from xerobootstrap and authentication keys from environment variables/docker 
 # and fetches info from get request. gets triggered in process_TB.py
@@ -18,29 +17,6 @@ def valid_date(s: str) -> str:
     return s
 
 
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_tokens(tokens):
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
-
-
-def refresh_access_token(refresh_token: str) -> dict:
-    client_id = os.environ["XERO_CLIENT_ID"]
-    client_secret = os.environ["XERO_CLIENT_SECRET"]
-
-    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {"Authorization": f"Basic {basic}"}
-    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
-
-
 #-----------------same for every case till now------------------------
 
 def fetch_bank_summary_json(access_token: str, tenant_id: str, to_date: str) -> dict:
@@ -52,23 +28,24 @@ def fetch_bank_summary_json(access_token: str, tenant_id: str, to_date: str) ->
     }
     params = {"date": to_date}
 
-    r = requests.get(url, headers=headers, params=params, timeout=60)
-    r.raise_for_status()
-    return r.json()
+    return get_json(url, headers=headers, params=params, timeout=60)
 
 
 def get_bank_summary_json(to_date: str) -> dict:
-    tokens = load_tokens()
+    payload = fetch_bank_summary_json(get_access_token(), get_tenant_id(), to_date)
+    return payload
 
-    refreshed = refresh_access_token(tokens["refresh_token"])
-    access_token = refreshed["access_token"]
 
-    # refresh token can rotate — keep the newest one
-    tokens["refresh_token"] = refreshed.get("refresh_token", tokens["refresh_token"])
-    save_tokens(tokens)
-    tenant_id= os.environ.get("tenant_id") or tokens.get("tenant_id")
-    payload = fetch_bank_summary_json(access_token, tenant_id, to_date)
-    return payload
+# Async variants: several TB dates requested side by side
+
+async def fetch_bank_summary_json_async(xc: AsyncXeroClient, to_date: str) -> dict:
+    return await xc.get_json(f"{ACCOUNTING_BASE}/Reports/TrialBalance", headers=xc.headers(),
+                             params={"date": to_date})
+
+
+def get_bank_summary_json_many(to_dates: list[str]) -> list[dict]:
+    # one payload per date, same order
+    return gather_json([(f"{ACCOUNTING_BASE}/Reports/TrialBalance", {"date": d}) for d in to_dates])
 
 
 #Accepted argument python xerosummary_TB.py 2025-01-31 but gets triggered in process_TB file...
@@ -1,39 +1,14 @@
 import os
 import json
-import base64
-import requests
+from xeroclient import get_json, iter_pages
+from xerotokens import get_access_token, get_tenant_id
 from typing import Optional, Dict, Any, List
 import argparse
 
-TOKEN_URL = "https://identity.xero.com/connect/token"
 ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
-TOKENS_FILE = "xero_tokens.json"
 Data_file = "banktrans.json"
 
 
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_tokens(tokens):
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
-
-
-def refresh_access_token(refresh_token: str) -> dict:
-    client_id = os.environ["XERO_CLIENT_ID"]
-    client_secret = os.environ["XERO_CLIENT_SECRET"]
-
-    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {"Authorization": f"Basic {basic}"}
-    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
-
-
 #-----------------same for every case till now------------------------
 def to_xero_datetime(date_str: str) -> str:
     y, m, d = date_str.split("-")
@@ -67,7 +42,8 @@ def fetch_bank_summary_json(
     tenant_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    contact_id: Optional[str] = None
+    contact_id: Optional[str] = None,
+    page: Optional[int] = None
 ) -> dict:
     url: str = f"{ACCOUNTING_BASE}/BankTransactions"
     where: Optional[str] = build_where(start_date=start_date, end_date=end_date, contact_id=contact_id)
@@ -79,30 +55,37 @@ def fetch_bank_summary_json(
     params: Dict[str, Any] = {}
     if where:
         params["where"] = where
-    r = requests.get(url, headers=headers, params=params, timeout=60)
-    r.raise_for_status()
-    return r.json()
+    # BankTransactions is paged (100 per page); without ?page Xero only returns page 1
+    if page:
+        params["page"] = page
+    return get_json(url, headers=headers, params=params, timeout=60)
 
 
 def get_bank_summary_json(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    contact_id: Optional[str] = None
+    contact_id: Optional[str] = None,
+    page: Optional[int] = None
 ) -> dict:
-    tokens: Dict[str, Any] = load_tokens()
-    refreshed: Dict[str, Any] = refresh_access_token(tokens["refresh_token"])
-    access_token: str = refreshed["access_token"]
-    tokens["refresh_token"] = refreshed.get("refresh_token", tokens.get("refresh_token"))
-    save_tokens(tokens)
     payload: dict = fetch_bank_summary_json(
-        access_token=access_token,
-        tenant_id= os.environ.get("tenant_id") or tokens.get("tenant_id"),
+        access_token=get_access_token(),
+        tenant_id=get_tenant_id(),
         start_date=start_date,
         end_date=end_date,
         contact_id=contact_id,
+        page=page,
     )
     return payload
 
+
+def iter_bank_summary_pages(start_date: Optional[str] = None, end_date: Optional[str] = None,
+                            contact_id: Optional[str] = None):
+    # Yields one BankTransactions payload per page until Xero runs out
+    yield from iter_pages(
+        lambda page: get_bank_summary_json(start_date, end_date, contact_id, page=page),
+        key="BankTransactions",
+    )
+
 #contact_id = "96988e67-ecf9-466d-bfbf-0afa1725a649"
 
 
@@ -0,0 +1,34 @@
+import json
+from xeroclient import get_json
+from xerotokens import get_access_token
+
+CONNECTIONS_URL = "https://api.xero.com/connections"
+
+# Organisations the current token can reach. One token covers every connected tenant;
+# the tenant is only picked per request through the xero-tenant-id header.
+
+
+#-----------------same for every case till now------------------------
+def fetch_bank_summary_json(access_token: str) -> list:
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/json"
+    }
+    return get_json(CONNECTIONS_URL, headers=headers, timeout=30)
+
+
+def get_bank_summary_json() -> list:
+    return fetch_bank_summary_json(get_access_token())
+
+
+def get_tenants() -> list[dict]:
+    """[{"tenant_id": ..., "tenant_name": ...}] for every connected organisation (practices skipped)."""
+    return [
+        {"tenant_id": c["tenantId"], "tenant_name": c.get("tenantName") or c["tenantId"]}
+        for c in get_bank_summary_json() or []
+        if c.get("tenantType", "ORGANISATION") == "ORGANISATION"
+    ]
+
+
+if __name__ == "__main__":
+    print(json.dumps(get_tenants(), indent=2))
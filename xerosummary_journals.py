@@ -1,37 +1,12 @@
 import os
 import json
-import base64
-import requests
+from xeroclient import get_json
+from xerotokens import get_access_token, get_tenant_id
 
-TOKEN_URL = "https://identity.xero.com/connect/token"
 ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
-TOKENS_FILE = "xero_tokens.json"
 Data_file = "complete_journals.json"
 
 
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_tokens(tokens):
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
-
-
-def refresh_access_token(refresh_token: str) -> dict:
-    client_id = os.environ["XERO_CLIENT_ID"]
-    client_secret = os.environ["XERO_CLIENT_SECRET"]
-
-    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {"Authorization": f"Basic {basic}"}
-    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
-
-
 #-----------------same for every case till now------------------------
 
 
@@ -51,25 +26,15 @@ def fetch_bank_summary_json(
 
     params = {"offset": offset}
 
-    r = requests.get(url, headers=headers, params=params, timeout=60)
-    r.raise_for_status()
-    return r.json()
+    return get_json(url, headers=headers, params=params, timeout=60)
 
 
 def get_bank_summary_json(offset: int) -> dict:
 
-    tokens = load_tokens()
-
-    refreshed = refresh_access_token(tokens["refresh_token"])
-    access_token = refreshed["access_token"]
-
-    # refresh token can rotate — keep the newest one
-    tokens["refresh_token"] = refreshed.get("refresh_token", tokens["refresh_token"])
-    save_tokens(tokens)
-
+    # token is cached by xerotokens, so each page costs a single GET
     payload = fetch_bank_summary_json(
-        access_token=access_token,
-        tenant_id= os.environ.get("tenant_id") or tokens.get("tenant_id"),
+        access_token=get_access_token(),
+        tenant_id=get_tenant_id(),
         offset=offset
     )
 
@@ -78,11 +43,11 @@ def get_bank_summary_json(offset: int) -> dict:
 
 
 
-def runjournal():
+def iter_journal_pages(offset: int = 0):
 
-    all_journals = []
+    # Xero returns journals with JournalNumber > offset, so starting from the stored
+    # high-water mark only pulls journals posted since the last run.
     limit = 100
-    offset = 0
 
     while True:
         response = get_bank_summary_json(offset)
@@ -92,13 +57,22 @@ def runjournal():
         if not journals:
             break
 
-        all_journals.extend(journals)
+        yield journals
 
         # Stop when API returns < 100
         #if len(journals) < limit:
         #   break
 
-        offset += limit
+        # next page starts after the highest journal number seen (numbers can have gaps)
+        numbers = [j["JournalNumber"] for j in journals if j.get("JournalNumber") is not None]
+        offset = max(numbers) if numbers else offset + limit
+
+
+def runjournal(offset: int = 0):
+
+    all_journals = []
+    for journals in iter_journal_pages(offset):
+        all_journals.extend(journals)
 
     return all_journals
 
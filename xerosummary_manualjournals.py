@@ -1,43 +1,20 @@
 import os
 import json
-import base64
-import requests
+from xeroclient import get_json, iter_pages
+from xerotokens import get_access_token, get_tenant_id
 
-TOKEN_URL = "https://identity.xero.com/connect/token"
 ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
-TOKENS_FILE = "xero_tokens.json"
 Data_file = "manualjournals.json"
 
 
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_tokens(tokens):
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
-
-
-def refresh_access_token(refresh_token: str) -> dict:
-    client_id = os.environ["XERO_CLIENT_ID"]
-    client_secret = os.environ["XERO_CLIENT_SECRET"]
-
-    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {"Authorization": f"Basic {basic}"}
-    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
-
-
 #-----------------same for every case till now------------------------
 
 
 def fetch_bank_summary_json(
     access_token: str,
-    tenant_id: str
+    tenant_id: str,
+    modified_since: str | None = None,
+    page: int | None = None
 ) -> dict:
 
     url = f"{ACCOUNTING_BASE}/ManualJournals"
@@ -47,32 +24,36 @@ def fetch_bank_summary_json(
         "xero-tenant-id": tenant_id,
         "Accept": "application/json"
     }
+    # Only journals created/changed since the last successful sync (UTC)
+    if modified_since:
+        headers["If-Modified-Since"] = modified_since
 
+    # ManualJournals is paged (100 per page); without ?page Xero only returns page 1
+    params = {"page": page} if page else None
 
-    r = requests.get(url, headers=headers, timeout=60)
-    r.raise_for_status()
-    return r.json()
-
-
-def get_bank_summary_json() -> dict:
-
-    tokens = load_tokens()
+    return get_json(url, headers=headers, params=params, timeout=60)
 
-    refreshed = refresh_access_token(tokens["refresh_token"])
-    access_token = refreshed["access_token"]
 
-    # refresh token can rotate — keep the newest one
-    tokens["refresh_token"] = refreshed.get("refresh_token", tokens["refresh_token"])
-    save_tokens(tokens)
+def get_bank_summary_json(modified_since: str | None = None, page: int | None = None) -> dict:
 
     payload = fetch_bank_summary_json(
-        access_token=access_token,
-        tenant_id= os.environ.get("tenant_id") or tokens.get("tenant_id")
+        access_token=get_access_token(),
+        tenant_id=get_tenant_id(),
+        modified_since=modified_since,
+        page=page
     )
 
     return payload
 
 
+def iter_bank_summary_pages(modified_since: str | None = None):
+    # Yields one ManualJournals payload per page until Xero runs out
+    yield from iter_pages(
+        lambda page: get_bank_summary_json(modified_since=modified_since, page=page),
+        key="ManualJournals",
+    )
+
+
 def main():
    # args = build_parser().parse_args()
     databt = get_bank_summary_json()
@@ -0,0 +1,45 @@
+import os
+import json
+from xeroclient import get_json
+from xerotokens import get_access_token, get_tenant_id
+from xerodates import parse_xero_date
+
+ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
+
+# Organisation settings; used for the lock date that decides which reports are final.
+# EndOfYearLockDate stops everyone, so only it can freeze a period (default).
+# PeriodLockDate stops everyone but advisers: XERO_LOCK_DATE_FIELD=PeriodLockDate also freezes
+# periods up to it, accepting that adviser adjustments posted there later never reach the sheets.
+LOCK_DATE_FIELDS = ("EndOfYearLockDate", "PeriodLockDate")
+LOCK_DATE_FIELD = os.environ.get("XERO_LOCK_DATE_FIELD", "EndOfYearLockDate")
+if LOCK_DATE_FIELD not in LOCK_DATE_FIELDS:
+    raise ValueError(f"XERO_LOCK_DATE_FIELD must be one of {LOCK_DATE_FIELDS}")
+
+
+#-----------------same for every case till now------------------------
+def fetch_bank_summary_json(access_token: str, tenant_id: str) -> dict:
+    url = f"{ACCOUNTING_BASE}/Organisation"
+    headers = {
+        "Authorization": f"Bearer {access_token}",
+        "xero-tenant-id": tenant_id,
+        "Accept": "application/json"
+    }
+    return get_json(url, headers=headers, timeout=60)
+
+
+def get_bank_summary_json() -> dict:
+    return fetch_bank_summary_json(get_access_token(), get_tenant_id())
+
+
+def get_lock_date() -> str | None:
+    """Organisation lock date as YYYY-MM-DD, or None when nothing is locked."""
+    orgs = get_bank_summary_json().get("Organisations") or [{}]
+    org = orgs[0]
+    # EndOfYearLockDate always holds; an opted-in PeriodLockDate can only move it later
+    dates = [d for d in (parse_xero_date(org.get("EndOfYearLockDate")),
+                         parse_xero_date(org.get(LOCK_DATE_FIELD))) if d]
+    return max(dates) if dates else None
+
+
+if __name__ == "__main__":
+    print(json.dumps({"lock_date": get_lock_date(), "field": LOCK_DATE_FIELD}))
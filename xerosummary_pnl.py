@@ -1,44 +1,21 @@
 import os
 import json
-import base64
-import requests
+from xeroclient import get_json
+from xerotokens import get_access_token, get_tenant_id
+from xeroasync import AsyncXeroClient, gather_json
 import argparse
 from datetime import datetime
 
-TOKEN_URL = "https://identity.xero.com/connect/token"
 ACCOUNTING_BASE = "https://api.xero.com/api.xro/2.0"
-TOKENS_FILE = "xero_tokens.json"
 Data_file = "pnl.json"
 
 VALID_TIMEFRAMES = {"MONTH", "QUARTER", "YEAR"}
+MAX_PERIODS = 11  # Xero's limit per request; process_PNL.pnl_windows splits longer ranges
 def valid_date(s: str) -> str:
     datetime.strptime(s, "%Y-%m-%d")
     return s
 
 
-def load_tokens():
-    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
-        return json.load(f)
-
-
-def save_tokens(tokens):
-    with open(TOKENS_FILE, "w", encoding="utf-8") as f:
-        json.dump(tokens, f, indent=2)
-
-
-def refresh_access_token(refresh_token: str) -> dict:
-    client_id = os.environ["XERO_CLIENT_ID"]
-    client_secret = os.environ["XERO_CLIENT_SECRET"]
-
-    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
-    headers = {"Authorization": f"Basic {basic}"}
-    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
-
-    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
-    r.raise_for_status()
-    return r.json()
-
-
 #-----------------same for every case till now------------------------
 def fetch_bank_summary_json(
     access_token: str,
@@ -48,24 +25,27 @@ def fetch_bank_summary_json(
     periods: int | None = None,
     timeframe: str | None = None,
 ) -> dict:
-    if periods is not None and not (1 <= periods <= 11):
-        raise ValueError("periods must be an integer between 1 and 11")
-    if timeframe and timeframe not in VALID_TIMEFRAMES:
-        raise ValueError(f"timeframe must be one of {sorted(VALID_TIMEFRAMES)}")
     url = f"{ACCOUNTING_BASE}/Reports/ProfitAndLoss"
     headers = {
         "Authorization": f"Bearer {access_token}",
         "xero-tenant-id": tenant_id,
         "Accept": "application/json",
     }
+    params = pnl_params(from_date, to_date, periods, timeframe)
+    return get_json(url, headers=headers, params=params, timeout=60)
+
+
+def pnl_params(from_date: str, to_date: str, periods: int | None = None, timeframe: str | None = None) -> dict:
+    if periods is not None and not (1 <= periods <= MAX_PERIODS):
+        raise ValueError(f"periods must be an integer between 1 and {MAX_PERIODS}")
+    if timeframe and timeframe not in VALID_TIMEFRAMES:
+        raise ValueError(f"timeframe must be one of {sorted(VALID_TIMEFRAMES)}")
     params = {"fromDate": from_date, "toDate": to_date}
     if periods is not None:
         params["periods"] = periods
     if timeframe:
         params["timeframe"] = timeframe
-    r = requests.get(url, headers=headers, params=params, timeout=60)
-    r.raise_for_status()
-    return r.json()
+    return params
 
 def get_bank_summary_json(
     from_date: str,
@@ -73,20 +53,33 @@ def get_bank_summary_json(
     periods: int | None = None,
     timeframe: str | None = None,
 ) -> dict:
-    tokens = load_tokens()
-    refreshed = refresh_access_token(tokens["refresh_token"])
-    access_token = refreshed["access_token"]
-    tokens["refresh_token"] = refreshed.get("refresh_token", tokens["refresh_token"])
-    save_tokens(tokens)
     return fetch_bank_summary_json(
-        access_token=access_token,
-        tenant_id= os.environ.get("tenant_id") or tokens.get("tenant_id"),
+        access_token=get_access_token(),
+        tenant_id=get_tenant_id(),
         from_date=from_date,
         to_date=to_date,
         periods=periods,
         timeframe=timeframe,
     )
 
+# Async variants: several PnL windows requested side by side
+
+async def fetch_bank_summary_json_async(
+    xc: AsyncXeroClient,
+    from_date: str,
+    to_date: str,
+    periods: int | None = None,
+    timeframe: str | None = None,
+) -> dict:
+    return await xc.get_json(f"{ACCOUNTING_BASE}/Reports/ProfitAndLoss", headers=xc.headers(),
+                             params=pnl_params(from_date, to_date, periods, timeframe))
+
+
+def get_bank_summary_json_many(windows: list[tuple]) -> list[dict]:
+    # windows: (from_date, to_date[, periods[, timeframe]]); one payload per window, same order
+    url = f"{ACCOUNTING_BASE}/Reports/ProfitAndLoss"
+    return gather_json([(url, pnl_params(*w)) for w in windows])
+
 def build_parser():
     p = argparse.ArgumentParser()
     p.add_argument("from_date", type=valid_date)
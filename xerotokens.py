@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import base64
+import tempfile
+import threading
+from contextlib import contextmanager
+import requests
+import xerocache
+
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes only ever run one process
+    fcntl = None
+
+# Shared token manager for every xerosummary_* fetcher.
+# The access token is cached in memory (and in xero_tokens.json via saved_at/expires_in)
+# until shortly before it expires, so a run refreshes once instead of once per API page.
+
+TOKEN_URL = "https://identity.xero.com/connect/token"
+TOKENS_FILE = "xero_tokens.json"
+
+# Refresh this many seconds before Xero says the token expires
+EXPIRY_MARGIN = 120
+
+_lock = threading.Lock()
+_cache: dict = {}
+
+# Set by the multi-tenant sync workers (one tenant per process); wins over env / xero_tokens.json
+_tenant_override: str | None = None
+
+
+def load_tokens():
+    with open(TOKENS_FILE, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_tokens(tokens):
+    # Write to a temp file next to the target and swap it in, so a crash mid-write
+    # never leaves a truncated xero_tokens.json (the refresh token would be lost).
+    folder = os.path.dirname(os.path.abspath(TOKENS_FILE))
+    fd, tmp_path = tempfile.mkstemp(prefix=".xero_tokens.", suffix=".tmp", dir=folder)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(tokens, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, TOKENS_FILE)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def refresh_access_token(refresh_token: str) -> dict:
+    client_id = os.environ["XERO_CLIENT_ID"]
+    client_secret = os.environ["XERO_CLIENT_SECRET"]
+
+    basic = base64.b64encode(f"{client_id}:{client_secret}".encode()).decode()
+    headers = {"Authorization": f"Basic {basic}"}
+    data = {"grant_type": "refresh_token", "refresh_token": refresh_token}
+
+    r = requests.post(TOKEN_URL, data=data, headers=headers, timeout=30)
+    r.raise_for_status()
+    return r.json()
+
+
+@contextmanager
+def _refresh_lock():
+    # Every tenant worker shares one refresh token and Xero rotates it on each refresh,
+    # so only one process may refresh at a time; the others re-read what it saved.
+    if fcntl is None:
+        yield
+        return
+    with open(f"{TOKENS_FILE}.lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _is_fresh(tokens: dict) -> bool:
+    if not tokens.get("access_token"):
+        return False
+    expires_at = (tokens.get("saved_at") or 0) + (tokens.get("expires_in") or 0)
+    return time.time() < expires_at - EXPIRY_MARGIN
+
+
+def get_access_token(force_refresh: bool = False) -> str:
+    """
+    Returns a valid access token, refreshing it at most once per expiry window.
+    Thread safe; the rotated refresh token is written back atomically.
+    """
+    with _lock:
+        if not force_refresh and _is_fresh(_cache):
+            return _cache["access_token"]
+
+        # Replay runs answer every call from xerocache; no refresh round trip to Xero
+        if xerocache.is_replay():
+            return load_tokens().get("access_token") or "replay"
+
+        with _refresh_lock():
+            tokens = load_tokens()
+
+            # Another process (previous main.py in trigger.sh, another tenant worker)
+            # may already hold a valid token
+            if not force_refresh and _is_fresh(tokens):
+                _cache.clear()
+                _cache.update(tokens)
+                return tokens["access_token"]
+
+            refreshed = refresh_access_token(tokens["refresh_token"])
+
+            # refresh token can rotate — keep the newest one
+            tokens["refresh_token"] = refreshed.get("refresh_token", tokens["refresh_token"])
+            tokens["access_token"] = refreshed["access_token"]
+            tokens["expires_in"] = refreshed.get("expires_in", tokens.get("expires_in"))
+            tokens["saved_at"] = int(time.time())
+            save_tokens(tokens)
+
+        _cache.clear()
+        _cache.update(tokens)
+        return tokens["access_token"]
+
+
+def set_tenant_id(tenant_id: str | None) -> None:
+    """Pins the tenant every later call in this process works on (None goes back to the default)."""
+    global _tenant_override
+    _tenant_override = tenant_id
+
+
+def get_tenant_id() -> str:
+    if _tenant_override:
+        return _tenant_override
+    tenant_id = os.environ.get("tenant_id")
+    if tenant_id:
+        return tenant_id
+    with _lock:
+        if _cache.get("tenant_id"):
+            return _cache["tenant_id"]
+    return load_tokens().get("tenant_id")